@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import argparse
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# compare the old preview conversion (channel swap + RGBA conversion) with qt_images.pillow_to_qimage()
+# every variant runs in a separate process, so peak memory of one variant does not hide the other one
+
+
+def legacy_pillow_to_qimage(img):
+    from PIL import Image
+    from PySide2.QtGui import QImage
+    if img.mode == "RGB":
+        r, g, b = img.split()
+        img = Image.merge("RGB", (b, g, r))
+    elif img.mode == "RGBA":
+        r, g, b, a = img.split()
+        img = Image.merge("RGBA", (b, g, r, a))
+    elif img.mode == "L":
+        img = img.convert("RGBA")
+    img2 = img.convert("RGBA")
+    data = img2.tobytes("raw", "RGBA")
+    qim = QImage(data, img.size[0], img.size[1], QImage.Format_ARGB32)
+    return qim.copy()
+
+
+def get_peak_memory():  # in bytes, None if it is not supported
+    try:
+        import resource
+    except ImportError:
+        return None
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return value if sys.platform == "darwin" else value * 1024
+
+
+def run_variant(variant, mode, width, height, repeats):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PIL import Image
+    from PySide2.QtGui import QGuiApplication, QPixmap
+    from qt_images import pillow_to_qimage
+    app = QGuiApplication.instance() or QGuiApplication([])
+    convert = legacy_pillow_to_qimage if variant == "legacy" else pillow_to_qimage
+    img = Image.effect_noise((width, height), 64).convert(mode)
+    base_memory = get_peak_memory()
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        pixmap = QPixmap.fromImage(convert(img))
+        times.append(time.perf_counter() - start)
+        del pixmap
+    peak_memory = get_peak_memory()
+    return {"variant": variant,
+            "best": min(times),
+            "mean": sum(times) / len(times),
+            "peak_delta": None if base_memory is None else peak_memory - base_memory}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of Pillow image to QPixmap conversion for the preview")
+    parser.add_argument("--width", type=int, default=7000)
+    parser.add_argument("--height", type=int, default=5000)
+    parser.add_argument("--modes", default="RGB,RGBA,L")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+    context = get_context("spawn")
+    print("image " + str(args.width) + "x" + str(args.height) + ", " + str(args.repeats) + " repeats")
+    for mode in args.modes.split(","):
+        results = []
+        for variant in ("legacy", "direct"):
+            with context.Pool(1) as pool:
+                results.append(pool.apply(run_variant, (variant, mode, args.width, args.height, args.repeats)))
+        for result in results:
+            memory = "n/a" if result["peak_delta"] is None else str(round(result["peak_delta"] / (1024 * 1024), 1)) + " MB"
+            print("%-5s %-7s best %8.1f ms  mean %8.1f ms  peak memory growth %s" % (mode, result["variant"], result["best"] * 1000, result["mean"] * 1000, memory))
+        print("%-5s speedup %.1fx" % (mode, results[0]["best"] / results[1]["best"]))
+
+
+if __name__ == "__main__":
+    main()
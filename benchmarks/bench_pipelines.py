@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from multiprocessing import get_context, active_children
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# throughput of the image -> pdf and the page synthesis jobs on generated sources
+# every case runs in a separate process, so the peak memory and the caches of one case do not affect the others
+# the processes are not pool workers: pool workers are daemonic and can not start the process pool of the workers cases
+# results can be saved as a baseline and compared with the later runs to find regressions
+
+IMAGE_SETS = {"jpg-small": ("jpg", 1200, 900, 60),  # name -> (format, width, height, count)
+              "jpg-large": ("jpg", 6000, 4000, 6),
+              "png-medium": ("png", 2000, 1500, 20)}
+PDF_SETS = {"text-pages": (2, 500)}  # name -> (files, pages per file)
+
+CASES = [("images", "jpg-small", "memory", {"mode": 1}),  # (job type, source set, output mode, parameters)
+         ("images", "jpg-small", "streaming", {"mode": 1}),
+         ("images", "jpg-large", "streaming", {"mode": 1}),
+         ("images", "jpg-large", "streaming", {"mode": 1, "dpi": 150, "compression": "jpeg"}),
+         ("images", "png-medium", "memory", {"mode": 0}),
+         ("images", "png-medium", "streaming", {"mode": 0}),
+         ("images", "png-medium", "workers", {"mode": 0}),
+         ("pages", "text-pages", "memory", {}),
+         ("pages", "text-pages", "streaming", {})]
+
+
+def get_case_name(case):
+    job_type, source_set, output_mode, params = case
+    return " ".join([job_type, source_set, output_mode] + [k + "=" + str(v) for k, v in sorted(params.items())])
+
+
+def make_images(directory, source_set, scale):
+    from PIL import Image
+    file_format, width, height, count = IMAGE_SETS[source_set]
+    gradient = Image.linear_gradient("L").resize((width, height))
+    paths = []
+    for i in range(max(1, int(count * scale))):
+        # noise on gradients, so the images are neither incompressible nor trivially small, and all of them are different
+        img = Image.merge("RGB", (gradient, Image.effect_noise((width, height), 40), gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+        path = os.path.join(directory, source_set + "_" + str(i) + "." + file_format)
+        if file_format == "jpg":
+            img.save(path, quality=90)
+        else:
+            img.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_pdfs(directory, source_set, scale):
+    from reportlab.pdfgen import canvas
+    files, pages = PDF_SETS[source_set]
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, source_set + "_" + str(i) + ".pdf")
+        canv = canvas.Canvas(path)
+        for page in range(max(1, int(pages * scale))):
+            canv.setFont("Helvetica", 12)
+            for line in range(40):
+                canv.drawString(50, 800 - line * 18, "file " + str(i) + " page " + str(page + 1) + " line " + str(line + 1) + " " + "lorem ipsum " * 5)
+            canv.showPage()
+        canv.save()
+        paths.append(path)
+    return paths
+
+
+def get_peak_memory():  # in bytes of this process and the largest child process, None if it is not supported
+    try:
+        import resource
+    except ImportError:
+        return None
+    value = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return value if sys.platform == "darwin" else value * 1024
+
+
+def run_case(case, sources, output_path, workers):
+    from processor_engine import ImagesToPdfJob, PagesToPdfJob, get_default_image_parameters
+    from reader_cache import get_reader_cache
+    from page_plan import PagePlan
+    job_type, source_set, output_mode, params = case
+    first_step = []
+    pages = [0]
+    processes = [1]  # the most processes seen during the job, this one and its children
+    start = time.perf_counter()
+    if job_type == "images":
+        img_params = get_default_image_parameters(params["mode"])
+        img_params.update(params)
+        img_params["streaming"] = output_mode != "memory"
+        img_params["workers"] = workers if output_mode == "workers" else 1
+        job = ImagesToPdfJob(output_path, sources, img_params)
+    else:
+        page_plan = PagePlan()
+        for path in sources:
+            page_plan.add_range(path, 0, get_reader_cache().get_pages_count(path))
+        job = PagesToPdfJob(output_path, page_plan, streaming=output_mode != "memory")
+    prepare_time = time.perf_counter() - start
+
+    def step_callback(step):
+        if len(first_step) == 0:
+            first_step.append(time.perf_counter() - start)
+        pages[0] = step[1]
+        processes[0] = max(processes[0], 1 + len(active_children()))
+
+    job.run(step_callback)
+    total_time = time.perf_counter() - start
+    stages = {"prepare": prepare_time, "first_step": first_step[0] if len(first_step) > 0 else None}
+    stages.update((stage, seconds) for stage, seconds in job.metrics.stage_times.items() if seconds > 0)  # stages measured by the job
+    stages["total"] = total_time
+    return {"case": get_case_name(case),
+            "pages": pages[0],
+            "pages_per_second": pages[0] / total_time,
+            "processes": processes[0],
+            "peak_memory": get_peak_memory(),
+            "output_size": os.path.getsize(output_path),
+            "stages": stages}
+
+
+def _child_main(queue, function, args):
+    try:
+        queue.put((True, function(*args)))
+    except Exception as e:
+        queue.put((False, repr(e)))
+
+
+def run_in_child(context, function, args):  # run function(*args) in a new non-daemonic process and return its result
+    queue = context.Queue()
+    process = context.Process(target=_child_main, args=(queue, function, args))
+    process.start()
+    is_ok, result = queue.get()  # before join(), the child waits until its result is read
+    process.join()
+    if is_ok is False:
+        raise RuntimeError(function.__name__ + " failed: " + result)
+    return result
+
+
+def format_result(result):
+    memory = "n/a" if result["peak_memory"] is None else str(round(result["peak_memory"] / (1024 * 1024))) + " MB"
+    stages = ", ".join(name + " " + ("n/a" if value is None else str(round(value * 1000)) + " ms") for name, value in result["stages"].items())
+    return "%-58s %7.1f pages/s  peak %7s  output %8.1f KB  (%s)" % (result["case"], result["pages_per_second"], memory, result["output_size"] / 1024, stages)
+
+
+def compare_results(results, baseline, tolerance):  # return list of regression messages
+    baseline_results = {r["case"]: r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = baseline_results.get(result["case"])
+        if old is None:
+            continue
+        if result["pages_per_second"] < old["pages_per_second"] * (1 - tolerance):
+            regressions.append(result["case"] + ": " + str(round(old["pages_per_second"], 1)) + " -> " + str(round(result["pages_per_second"], 1)) + " pages/s")
+        if result["peak_memory"] is not None and old["peak_memory"] is not None and result["peak_memory"] > old["peak_memory"] * (1 + tolerance):
+            regressions.append(result["case"] + ": peak memory " + str(round(old["peak_memory"] / (1024 * 1024))) + " -> " + str(round(result["peak_memory"] / (1024 * 1024))) + " MB")
+        if result["output_size"] > old["output_size"] * (1 + tolerance):
+            regressions.append(result["case"] + ": output " + str(old["output_size"]) + " -> " + str(result["output_size"]) + " bytes")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the image to pdf and the page synthesis jobs")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of images and pages of every source set")
+    parser.add_argument("--repeats", type=int, default=3, help="the best of the repeats is reported")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="processes of the cases with workers")
+    parser.add_argument("--filter", default="", help="run only cases which contain this text")
+    parser.add_argument("--save-baseline", default=None, help="save results to this json file")
+    parser.add_argument("--baseline", default=None, help="compare results with this json file, exit with 1 if there are regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown or growth before a result is a regression")
+    args = parser.parse_args(argv)
+    context = get_context("spawn")
+    cases = [c for c in CASES if args.filter in get_case_name(c)]
+    results = []
+    errors = []
+    with tempfile.TemporaryDirectory() as directory:
+        sources = {}
+        for case in cases:
+            source_set = case[1]
+            if source_set not in sources:
+                # sources are made in other process, otherwise the peak memory of the cases starts from the memory used here
+                sources[source_set] = run_in_child(context, make_images if case[0] == "images" else make_pdfs, (directory, source_set, args.scale))
+        for case in cases:
+            output_path = os.path.join(directory, "output.pdf")
+            case_results = []
+            for i in range(args.repeats):
+                case_results.append(run_in_child(context, run_case, (case, sources[case[1]], output_path, args.workers)))
+            result = max(case_results, key=lambda r: r["pages_per_second"])
+            result["peak_memory"] = None if result["peak_memory"] is None else min(r["peak_memory"] for r in case_results)
+            results.append(result)
+            print(format_result(result))
+            if case[2] == "workers" and args.workers > 1 and result["processes"] < 2:
+                errors.append(get_case_name(case) + ": the job used one process, the workers were not started")
+    for message in errors:
+        print("Error " + message)
+    if len(errors) > 0:
+        return 1
+    data = {"scale": args.scale, "workers": args.workers, "python": sys.version.split()[0], "results": results}
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as file:
+            json.dump(data, file, indent=1)
+        print("Save baseline " + args.save_baseline)
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("scale") != args.scale:
+            print("Baseline is made with scale " + str(baseline.get("scale")) + ", results are not comparable")
+            return 2
+        regressions = compare_results(results, baseline, args.tolerance)
+        for message in regressions:
+            print("Regression " + message)
+        if len(regressions) > 0:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
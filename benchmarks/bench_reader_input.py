@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# compare reading of a big source pdf through the buffered file object and through the memory map
+# the source is made of text pages, so the time is spent in the xref lookups and the object parsing
+# every variant runs in a separate process with the source file already in the os cache
+
+
+def make_source(path, pages):
+    from reportlab.pdfgen import canvas
+    canv = canvas.Canvas(path)
+    for i in range(pages):
+        if i == 0:
+            canv.bookmarkPage("first")
+        canv.drawString(100, 750, "page " + str(i + 1))
+        canv.linkAbsolute("first", "first", (100, 600, 300, 650))
+        canv.showPage()
+    canv.save()
+
+
+def run_variant(variant, source_path, output_path):
+    import reader_cache
+    from processor_engine import PagesToPdfJob
+    from page_plan import PagePlan
+    reader_cache.USE_MMAP = variant == "mmap"
+    start = time.perf_counter()
+    pages = reader_cache.get_reader_cache().get_pages_count(source_path)
+    count_time = time.perf_counter() - start
+    page_plan = PagePlan()
+    page_plan.add_range(source_path, 0, pages)
+    start = time.perf_counter()
+    PagesToPdfJob(output_path, page_plan, streaming=True).run()
+    copy_time = time.perf_counter() - start
+    return {"variant": variant, "count": count_time, "copy": copy_time}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the source pdf reading through file object and memory map")
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+    context = get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, "source.pdf")
+        output_path = os.path.join(directory, "output.pdf")
+        make_source(source_path, args.pages)
+        print("source " + str(args.pages) + " pages, " + str(round(os.path.getsize(source_path) / (1024 * 1024), 1)) + " MB")
+        for variant in ("file", "mmap"):
+            results = []
+            for i in range(args.repeats):
+                with context.Pool(1) as pool:
+                    results.append(pool.apply(run_variant, (variant, source_path, output_path)))
+            print("%-5s pages count best %8.1f ms  copy all pages best %8.1f ms" % (variant, min(r["count"] for r in results) * 1000, min(r["copy"] for r in results) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# cold start of the gui: every run is a new interpreter, the time is measured from the process start to the shown window
+# -X importtime shows which modules are imported at the start and how long they take
+# the libraries from LAZY_MODULES should be imported only when the user adds files or creates a pdf
+
+LAZY_MODULES = ("PyPDF2", "reportlab", "PIL.Image", "fitz", "pymupdf", "tab_synth_pdf", "pdf_writer")
+DEFAULT_BUDGET_MS = 1500
+
+WINDOW_SCRIPT = """
+import sys, json
+from PySide2.QtWidgets import QApplication
+import pdf_processor
+app = QApplication(sys.argv)
+pdf_processor.appQt = app
+win = pdf_processor.MainWindow()
+win.show()
+app.processEvents()
+print(json.dumps([m for m in %r if m in sys.modules]))
+"""
+
+
+def run_window(env):  # return (milliseconds from the start of the process to the shown window, lazy modules which are imported)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", WINDOW_SCRIPT % (LAZY_MODULES,)], cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+    elapsed = (time.perf_counter() - start) * 1000
+    return (elapsed, json.loads(output.decode().strip().splitlines()[-1]))
+
+
+def run_importtime(env):  # return (total import time of pdf_processor in milliseconds, {top level package: self time in milliseconds})
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import pdf_processor"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True).stderr
+    total = 0
+    packages = {}
+    for line in output.decode(errors="replace").splitlines():
+        if line.startswith("import time:") is False or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if parts[0].strip().isdigit() is False:  # the header line
+            continue
+        self_time, cumulative, name = int(parts[0]), int(parts[1]), parts[2].strip()
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_time / 1000
+        if name == "pdf_processor":
+            total = cumulative / 1000
+    return (total, packages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the gui start and of the imports at the start")
+    parser.add_argument("--repeats", type=int, default=5, help="the best of the repeats is reported")
+    parser.add_argument("--top", type=int, default=10, help="number of the slowest packages to show")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="exit with 1 if the best start is slower")
+    args = parser.parse_args(argv)
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")  # works without a display, the time of the real window is close
+    window_times = []
+    import_times = []
+    lazy_imported = set()
+    packages = {}
+    for i in range(args.repeats):
+        elapsed, imported = run_window(env)
+        window_times.append(elapsed)
+        lazy_imported.update(imported)
+        total, run_packages = run_importtime(env)
+        import_times.append(total)
+        for package, value in run_packages.items():
+            packages[package] = min(value, packages.get(package, value))
+    print("start to shown window: best %.0f ms, mean %.0f ms" % (min(window_times), sum(window_times) / len(window_times)))
+    print("import of pdf_processor: best %.0f ms" % min(import_times))
+    for package, value in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print("  %-24s %7.1f ms" % (package, value))
+    is_ok = True
+    if len(lazy_imported) > 0:
+        print("Imported at the start: " + ", ".join(sorted(lazy_imported)))
+        is_ok = False
+    if min(window_times) > args.budget_ms:
+        print("Start is slower than the budget of " + str(args.budget_ms) + " ms")
+        is_ok = False
+    return 0 if is_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
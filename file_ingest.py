@@ -0,0 +1,48 @@
+import os
+import re
+import glob
+from reader_cache import get_reader_cache
+
+# bulk import of files: directories and glob patterns are expanded to the files in the natural order,
+# then every file is checked by its content, so renamed or broken files are not added to the lists
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".bmp", ".png", ".tif", ".tiff")
+PDF_EXTENSIONS = (".pdf",)
+
+_digits_re = re.compile(r"(\d+)")
+
+
+def natural_sort_key(path):  # "scan_2.jpg" goes before "scan_10.jpg", "scan.jpg" goes before "scan_1.jpg"
+    name, extension = os.path.splitext(path)
+    return ([int(part) if part.isdigit() else part.lower() for part in _digits_re.split(name)], extension.lower())
+
+
+def is_glob_pattern(source):
+    return any(c in source for c in "*?[")
+
+
+def find_files(sources, extensions):  # sources are files, directories (scanned recursively) or glob patterns ("scans/**/*.png")
+    found = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths = [os.path.join(root, name) for root, dirs, files in os.walk(source) for name in files]
+        elif is_glob_pattern(source):
+            paths = [p for p in glob.glob(source, recursive=True) if os.path.isfile(p)]
+        else:  # files are kept as they are, even with other extensions, the probe checks them
+            found.append(source)
+            continue
+        found.extend(sorted([p for p in paths if os.path.splitext(p)[1].lower() in extensions], key=natural_sort_key))
+    return found  # repeated files are kept, the same image can be used for several pages
+
+
+def probe_image(path):  # return (width, height), Pillow reads only the header of the file
+    from PIL import Image
+    with Image.open(path) as img:
+        return img.size
+
+
+def probe_pdf(path):  # return pages count, the parsed reader stays in the reader cache
+    with open(path, "rb") as file:
+        if file.read(1024).find(b"%PDF-") < 0:
+            raise ValueError("not a pdf file")
+    return get_reader_cache().get_pages_count(path)
@@ -0,0 +1,152 @@
+import io
+import zlib
+import time
+import struct
+
+# functions of this module are executed in worker processes, so they accept and return only plain data
+# Pillow is imported by the functions which decode images, so the module is cheap to import at the start of the gui
+
+FLATE_LEVEL = 6
+JPEG_QUALITY = 85
+RESAMPLE_REDUCING_GAP = 3.0  # reduce() by the integer factor first while the image stays 3 times larger than the result
+JPEG_SOF_MARKERS = (0xC0, 0xC1, 0xC2)  # baseline, extended and progressive huffman jpeg, all of them are supported by DCTDecode
+JPEG_COLOR_SPACES = {1: "DeviceGray", 3: "DeviceRGB", 4: "DeviceCMYK"}
+
+
+def probe_jpeg(img_path):  # read only jpeg headers, return (width, height, components, is_adobe) or None if the file can not be embedded as is
+    with open(img_path, "rb") as file:
+        if file.read(2) != b"\xff\xd8":
+            return None
+        is_adobe = False
+        while True:
+            byte = file.read(1)
+            if len(byte) == 0:
+                return None
+            if byte != b"\xff":
+                continue
+            marker = file.read(1)
+            while marker == b"\xff":  # fill bytes
+                marker = file.read(1)
+            if len(marker) == 0:
+                return None
+            marker = marker[0]
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without length
+                continue
+            length_bytes = file.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = struct.unpack(">H", length_bytes)[0]
+            if marker in JPEG_SOF_MARKERS:
+                header = file.read(6)
+                if len(header) < 6:
+                    return None
+                precision, height, width, components = struct.unpack(">BHHB", header)
+                if precision != 8 or width == 0 or height == 0 or components not in JPEG_COLOR_SPACES:
+                    return None
+                return (width, height, components, is_adobe)
+            elif 0xC3 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):  # lossless, hierarchical or arithmetic coding
+                return None
+            elif marker == 0xDA or marker == 0xD9:  # start of scan or end of image before frame header
+                return None
+            segment = file.read(length - 2)
+            if marker == 0xEE and segment.startswith(b"Adobe"):
+                is_adobe = True
+
+
+def get_image_size(img_path):
+    jpeg_info = probe_jpeg(img_path)
+    if jpeg_info is not None:
+        return (jpeg_info[0], jpeg_info[1])
+    from PIL import Image
+    with Image.open(img_path) as img:
+        return img.size
+
+
+def _convert_for_pdf(img):  # return (converted image, pdf color space name)
+    if img.mode in ("1", "L", "LA", "I", "I;16", "F"):
+        return (img.convert("L"), "DeviceGray")
+    elif img.mode == "CMYK":
+        return (img, "DeviceCMYK")
+    elif img.mode == "RGB":
+        return (img, "DeviceRGB")
+    else:
+        return (img.convert("RGB"), "DeviceRGB")
+
+
+def encode_jpeg(img_path):  # embed original jpeg data without decoding, return None for unsupported files
+    jpeg_info = probe_jpeg(img_path)
+    if jpeg_info is None:
+        return None
+    width, height, components, is_adobe = jpeg_info
+    with open(img_path, "rb") as file:
+        data = file.read()
+    return {"width": width,
+            "height": height,
+            "color_space": JPEG_COLOR_SPACES[components],
+            "bits": 8,
+            "filter": "DCTDecode",
+            # adobe applications write inverted cmyk values
+            "decode": (1, 0, 1, 0, 1, 0, 1, 0) if components == 4 and is_adobe else None,
+            "data": data}
+
+
+def _is_larger(size, target_size):
+    return size[0] > target_size[0] or size[1] > target_size[1]
+
+
+def _get_fit_size(size, target_size):  # the largest size with the proportions of size which fits target_size
+    scale = min(target_size[0] / size[0], target_size[1] / size[1])
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+
+def encode_image(img_path, target_size=None, compression="flate", quality=JPEG_QUALITY):
+    # return pdf image XObject data, images larger than target_size (in pixels) are downsampled (never enlarged) and compressed
+    # with jpeg or flate, jpeg files which do not need downsampling are used as is, other images are decoded and compressed
+    # "timings" of the result are seconds of the open, decode, resample and encode stages for the job metrics
+    start = time.perf_counter()
+    if target_size is None or _is_larger(get_image_size(img_path), target_size) is False:
+        image = encode_jpeg(img_path)
+        if image is not None:
+            image["timings"] = {"open": time.perf_counter() - start}
+            return image
+    from PIL import Image
+    with Image.open(img_path) as img:
+        timings = {"open": time.perf_counter() - start}
+        start = time.perf_counter()
+        size = None
+        if target_size is not None and _is_larger(img.size, target_size):
+            size = _get_fit_size(img.size, target_size)
+            # jpeg decoder scales by 1/2, 1/4 or 1/8 while decoding, the rest is done by reduce() and the resampling of the small image
+            img.draft(img.mode, size)
+        img.load()
+        timings["decode"] = time.perf_counter() - start
+        start = time.perf_counter()
+        if size is not None and img.size != size:
+            img = img.resize(size, Image.LANCZOS, reducing_gap=RESAMPLE_REDUCING_GAP)
+        timings["resample"] = time.perf_counter() - start
+        start = time.perf_counter()
+        converted, color_space = _convert_for_pdf(img)
+        if compression == "jpeg":
+            data = io.BytesIO()
+            converted.save(data, "JPEG", quality=quality)
+            image = {"width": converted.size[0],
+                     "height": converted.size[1],
+                     "color_space": color_space,
+                     "bits": 8,
+                     "filter": "DCTDecode",
+                     "decode": (1, 0, 1, 0, 1, 0, 1, 0) if color_space == "DeviceCMYK" else None,  # Pillow writes inverted adobe cmyk
+                     "data": data.getvalue()}
+        else:
+            image = {"width": converted.size[0],
+                     "height": converted.size[1],
+                     "color_space": color_space,
+                     "bits": 8,
+                     "filter": "FlateDecode",
+                     "data": zlib.compress(converted.tobytes(), FLATE_LEVEL)}
+        timings["encode"] = time.perf_counter() - start
+        image["timings"] = timings
+        return image
+
+
+def encode_image_task(task):  # task is (image path, target size, compression, quality), for Pool.imap()
+    return encode_image(*task)
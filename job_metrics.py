@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# timings of the job stages for every page, bytes read and written and the peak memory
+# on linux the peak memory of the process is reset at the start of the job, so it is the peak of the job (jobs running
+# at the same time share it), on other systems it is the peak of the whole process life and it is labeled so
+# worker processes are measured by the system only for the whole life, they are added if they have a new largest peak
+# stages of the image encoding are measured in the worker processes and added with add_times()
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+STAGES = ("open", "layout", "decode", "resample", "encode", "assemble", "write")
+METRICS_LOG_ENV = "PDF_PROCESSOR_METRICS_LOG"  # json lines file for the metrics of all jobs, if the log is not set for the job
+
+_log_lock = threading.Lock()  # jobs of the gui run in threads and write to the same log
+
+
+def get_rusage_peak(who):  # peak resident memory in bytes of resource.RUSAGE_SELF or RUSAGE_CHILDREN for the process life
+    value = resource.getrusage(who).ru_maxrss
+    return value if sys.platform == "darwin" else value * 1024
+
+
+def get_peak_memory():  # peak resident memory of the process and its largest child process in bytes, None if it is not supported
+    if resource is None:
+        return None
+    return max(get_rusage_peak(resource.RUSAGE_SELF), get_rusage_peak(resource.RUSAGE_CHILDREN))
+
+
+def reset_peak_memory():  # start a new peak of this process, return False if the system can not do it
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def get_reset_peak_memory():  # peak resident memory of this process since reset_peak_memory() in bytes, None if it is not known
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def format_bytes(value):
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return str(round(value, 1)) + " " + unit
+        value /= 1024
+    return str(round(value, 1)) + " GB"
+
+
+class JobMetrics(object):
+    def __init__(self, name="", log_path=None):
+        self.name = name
+        self.log_path = log_path if log_path is not None else os.environ.get(METRICS_LOG_ENV)
+        self.records = []  # (page, stage, seconds) only if there is a log, page is None for the stages of the whole job
+        self.stage_times = dict.fromkeys(STAGES, 0.0)
+        self.pages = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_memory = None
+        self.peak_memory_scope = "process"  # "job" if the peak is measured from the start of the job
+        self.start_memory = None  # resident memory of the process at the start of the job, if the peak is reset
+        self.start_time = None
+        self._children_peak = None  # the largest peak of the finished child processes at the start
+        self.total_time = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        if resource is not None and reset_peak_memory():
+            self.peak_memory_scope = "job"
+            self.start_memory = get_reset_peak_memory()  # right after the reset the peak is the current memory
+            self._children_peak = get_rusage_peak(resource.RUSAGE_CHILDREN)
+
+    def add_time(self, stage, seconds, page=None):
+        if self.log_path is not None:  # without the log only the totals are kept, long jobs and finished jobs of the gui stay small
+            self.records.append((page, stage, seconds))
+        self.stage_times[stage] = self.stage_times.get(stage, 0.0) + seconds
+
+    def add_times(self, timings, page=None):  # timings is a dictionary stage -> seconds
+        for stage, seconds in timings.items():
+            self.add_time(stage, seconds, page)
+
+    @contextmanager
+    def stage(self, stage, page=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start, page)
+
+    def finish(self, bytes_written=0):
+        self.total_time = time.perf_counter() - self.start_time
+        self.bytes_written = bytes_written
+        if self.peak_memory_scope == "job":
+            self.peak_memory = get_reset_peak_memory()
+            children_peak = get_rusage_peak(resource.RUSAGE_CHILDREN)
+            if self.peak_memory is not None and children_peak > self._children_peak:  # a worker process of the job has the new largest peak
+                self.peak_memory = max(self.peak_memory, children_peak)
+        else:
+            self.peak_memory = get_peak_memory()
+        if self.log_path is not None:
+            self.write_log(self.log_path)
+
+    def to_data(self):
+        return {"job": self.name,
+                "pages": self.pages,
+                "total": self.total_time,
+                "stages": dict(self.stage_times),
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "peak_memory": self.peak_memory,
+                "peak_memory_scope": self.peak_memory_scope,
+                "start_memory": self.start_memory}
+
+    def write_log(self, log_path):  # one line for every record and the summary line, all lines of the job are written at once
+        lines = [json.dumps({"job": self.name, "page": page, "stage": stage, "seconds": seconds}) for page, stage, seconds in self.records]
+        lines.append(json.dumps(dict(self.to_data(), summary=True)))
+        with _log_lock:
+            with open(log_path, "a") as file:
+                file.write("\n".join(lines) + "\n")
+
+    def get_summary(self):  # short text for the gui, stages are shown by their part of all measured time
+        measured = sum(self.stage_times.values())
+        stages = sorted([(t, s) for s, t in self.stage_times.items() if t > 0], reverse=True)
+        text = str(self.pages) + " pages in " + str(round(self.total_time or 0, 2)) + " s"
+        if measured > 0:
+            text += ", " + ", ".join(s + " " + str(round(t * 100 / measured)) + "%" for t, s in stages[:3])
+        return text
+
+    def get_details(self):  # multiline text with all stages and counters
+        lines = [self.get_summary()]
+        for stage in STAGES:
+            if self.stage_times.get(stage, 0) > 0:
+                lines.append(stage + ": " + str(round(self.stage_times[stage] * 1000)) + " ms")
+        lines.append("read " + format_bytes(self.bytes_read) + ", written " + format_bytes(self.bytes_written))
+        if self.peak_memory is not None:
+            if self.peak_memory_scope == "job":
+                lines.append("peak memory " + format_bytes(self.peak_memory) + ("" if self.start_memory is None else ", " + format_bytes(self.start_memory) + " at the start"))
+            else:
+                lines.append("process peak memory " + format_bytes(self.peak_memory))
+        return "\n".join(lines)
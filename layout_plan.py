@@ -0,0 +1,116 @@
+from array import array
+from itertools import chain
+
+# page layout of the image to pdf jobs: page sizes and image rectangles of all pages are computed at once from the image sizes,
+# so the writing of the pages only reads the plan and the layout can be shown before any image is decoded
+# NumPy computes the plan with a few array operations for all pages, without NumPy the pages are computed one by one
+
+MM = 72.0 / 2.54 * 0.1  # pdf units in one millimeter, the same values as reportlab.lib.pagesizes without importing reportlab
+PAGE_SIZES = {1: (210 * MM, 297 * MM), 2: (148 * MM, 210 * MM), 3: (105 * MM, 148 * MM), 4: (8.5 * 72.0, 11 * 72.0)}  # A4, A5, A6, letter
+VECTORIZE_MIN_PAGES = 256  # smaller plans are computed page by page in less time than the array operations and the import of NumPy take
+# align -> (horizontal, vertical), horizontal: 0 - center, 1 - left, 2 - right; vertical: 0 - center, 1 - top, 2 - bottom
+ALIGN_SIDES = ((0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2))
+
+
+def _get_numpy():  # None if NumPy is not installed, it is imported by the first layout and not at the start of the gui
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def get_image_placement(width, height, img_params):  # return ((page width, page height), (x, y, image width, image height)) in pdf units
+    mode = img_params["mode"]
+    margin = img_params["margin"]
+    if mode == 0:
+        pixels = img_params["pixels"]
+        page_width = width + 2 * margin
+        page_height = height + 2 * margin
+        return ((page_width / pixels, page_height / pixels), (margin / pixels, margin / pixels, width / pixels, height / pixels))
+    page_width, page_height = PAGE_SIZES[mode]
+    img_prop = height / width
+    page_prop = page_height / page_width
+    img_width = page_width - 2 * margin
+    img_height = page_height - 2 * margin
+    if img_prop > page_prop:
+        img_width = img_height / img_prop
+    else:
+        img_height = img_width * img_prop
+    horizontal, vertical = ALIGN_SIDES[img_params["align"]]
+    if horizontal == 0:
+        x_shift = (page_width - img_width) / 2
+    elif horizontal == 1:
+        x_shift = margin
+    else:
+        x_shift = page_width - img_width - margin
+    if vertical == 0:
+        y_shift = (page_height - img_height) / 2
+    elif vertical == 1:
+        y_shift = page_height - img_height - margin
+    else:
+        y_shift = margin
+    return ((page_width, page_height), (x_shift, y_shift, img_width, img_height))
+
+
+class LayoutPlan(object):
+    # page sizes and image rectangles of all pages in six arrays of doubles, in pdf units
+    def __init__(self, page_widths, page_heights, xs, ys, widths, heights):
+        self.page_widths = page_widths
+        self.page_heights = page_heights
+        self.xs = xs
+        self.ys = ys
+        self.widths = widths
+        self.heights = heights
+
+    def __len__(self):
+        return len(self.page_widths)
+
+    def get_page(self, index):  # the same form as get_image_placement()
+        return ((self.page_widths[index], self.page_heights[index]), (self.xs[index], self.ys[index], self.widths[index], self.heights[index]))
+
+
+def _to_array(numpy, values, count):  # numpy array or number -> array of doubles with count items
+    return array("d", numpy.broadcast_to(numpy.asarray(values, dtype=numpy.float64), (count,)).tobytes())
+
+
+def compute_layout(sizes, img_params):  # sizes is a list of (width, height) of the images in pixels, return LayoutPlan
+    numpy = _get_numpy() if len(sizes) >= VECTORIZE_MIN_PAGES else None
+    if numpy is None:
+        columns = [array("d") for i in range(6)]
+        for width, height in sizes:
+            (page_width, page_height), placement = get_image_placement(width, height, img_params)
+            for column, value in zip(columns, (page_width, page_height) + placement):
+                column.append(value)
+        return LayoutPlan(*columns)
+    count = len(sizes)
+    size_array = numpy.fromiter(chain.from_iterable(sizes), dtype=numpy.float64, count=2 * count).reshape(count, 2)  # faster than numpy.array() of tuples
+    widths = size_array[:, 0]
+    heights = size_array[:, 1]
+    mode = img_params["mode"]
+    margin = float(img_params["margin"])
+    if mode == 0:
+        pixels = img_params["pixels"]
+        values = ((widths + 2 * margin) / pixels, (heights + 2 * margin) / pixels, margin / pixels, margin / pixels, widths / pixels, heights / pixels)
+        return LayoutPlan(*[_to_array(numpy, v, count) for v in values])
+    # the same operations as get_image_placement(), so both give the same numbers
+    page_width, page_height = PAGE_SIZES[mode]
+    img_prop = heights / widths
+    is_higher = img_prop > page_height / page_width
+    img_widths = numpy.where(is_higher, (page_height - 2 * margin) / img_prop, page_width - 2 * margin)
+    img_heights = numpy.where(is_higher, page_height - 2 * margin, (page_width - 2 * margin) * img_prop)
+    horizontal, vertical = ALIGN_SIDES[img_params["align"]]  # the align is the same for all pages
+    if horizontal == 0:
+        xs = (page_width - img_widths) / 2
+    elif horizontal == 1:
+        xs = margin
+    else:
+        xs = page_width - img_widths - margin
+    if vertical == 0:
+        ys = (page_height - img_heights) / 2
+    elif vertical == 1:
+        ys = page_height - img_heights - margin
+    else:
+        ys = margin
+    values = (page_width, page_height, xs, ys, img_widths, img_heights)
+    return LayoutPlan(*[_to_array(numpy, v, count) for v in values])
@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_right
+
+# ordered list of pages to write, stored as runs (source id, start page, stop page) in three arrays
+# stop page is exclusive, consecutive pages of the same source are merged into one run
+
+
+class PagePlan(object):
+    def __init__(self):
+        self.sources = []  # source id -> path to the pdf file
+        self._source_ids = {}
+        self.run_sources = array("i")
+        self.run_starts = array("i")
+        self.run_stops = array("i")
+        self.pages_count = 0
+
+    def __len__(self):
+        return self.pages_count
+
+    def get_source_id(self, pdf_path):
+        source_id = self._source_ids.get(pdf_path)
+        if source_id is None:
+            source_id = len(self.sources)
+            self.sources.append(pdf_path)
+            self._source_ids[pdf_path] = source_id
+        return source_id
+
+    def add_range(self, pdf_path, start, stop):
+        if stop <= start:
+            return
+        source_id = self.get_source_id(pdf_path)
+        last = len(self.run_sources) - 1
+        if last >= 0 and self.run_sources[last] == source_id and self.run_stops[last] == start:
+            self.run_stops[last] = stop
+        else:
+            self.run_sources.append(source_id)
+            self.run_starts.append(start)
+            self.run_stops.append(stop)
+        self.pages_count += stop - start
+
+    def add_page(self, pdf_path, page_index):
+        self.add_range(pdf_path, page_index, page_index + 1)
+
+    def runs(self):  # iterate over (source id, start, stop)
+        return zip(self.run_sources, self.run_starts, self.run_stops)
+
+    def runs_count(self):
+        return len(self.run_sources)
+
+    def pages(self):  # iterate over (path, page index) in the output order
+        for source_id, start, stop in self.runs():
+            pdf_path = self.sources[source_id]
+            for page_index in range(start, stop):
+                yield (pdf_path, page_index)
+
+    def get_run_offsets(self):  # position of the first page of every run in the output order
+        offsets = array("i")
+        position = 0
+        for start, stop in zip(self.run_starts, self.run_stops):
+            offsets.append(position)
+            position += stop - start
+        return offsets
+
+    def slices(self, ranges):  # ranges is a list of (start, stop) positions in the plan, stop is exclusive, return PagePlan for every range
+        offsets = self.get_run_offsets()
+        plans = []
+        for start, stop in ranges:
+            plan = PagePlan()
+            run = max(0, bisect_right(offsets, start) - 1)  # the run with the first page of the range
+            while run < len(offsets) and offsets[run] < stop:
+                run_start = self.run_starts[run]
+                run_length = self.run_stops[run] - run_start
+                plan.add_range(self.sources[self.run_sources[run]], run_start + max(0, start - offsets[run]), run_start + min(run_length, stop - offsets[run]))
+                run += 1
+            plans.append(plan)
+        return plans
+
+    def to_data(self):
+        return {"sources": list(self.sources), "runs": [[s, a, b] for s, a, b in self.runs()]}
+
+    @staticmethod
+    def from_data(data):  # data is returned by to_data() or it is a dictionary {file1: [p1, p2, ...], file2: [...]}
+        plan = PagePlan()
+        if isinstance(data, PagePlan):
+            return data
+        if isinstance(data, dict) and "sources" in data and "runs" in data:
+            for source_id, start, stop in data["runs"]:
+                plan.add_range(data["sources"][source_id], start, stop)
+        else:
+            for pdf_path, pages_array in data.items():
+                for page_index in pages_array:
+                    plan.add_page(pdf_path, page_index)
+        return plan
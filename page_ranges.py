@@ -0,0 +1,97 @@
+# page range expressions like "1-50, 80-, odd, !3-7", page numbers are 1-based and ranges include both ends
+# terms are applied from left to right: a term adds its pages, a term with ! removes them,
+# an expression which starts with ! removes pages from all pages ("!1" is every page except the first one)
+# the expression is parsed once, then it is evaluated for files of any length as a mask and runs of the selected pages
+# in the order of the file (selection of the Synth tab), or as runs in the order of the terms with repeated pages (command line)
+
+KEYWORDS = {"all": (0, None, 1), "odd": (0, None, 2), "even": (1, None, 2)}  # name -> (start, stop, step)
+
+
+def parse_range(text):  # "5", "3-7", "80-" or "-10", return (start, stop) 0-based, stop is exclusive or None for the last page
+    first, separator, last = text.partition("-")
+    first = first.strip()
+    last = last.strip()
+    try:
+        start = int(first) - 1 if len(first) > 0 else 0
+        if len(separator) == 0:
+            stop = start + 1
+        else:
+            stop = int(last) if len(last) > 0 else None
+    except ValueError:
+        raise ValueError("Wrong range " + text.strip())
+    if start < 0 or (stop is not None and stop <= start):
+        raise ValueError("Wrong range " + text.strip())
+    return (start, stop)
+
+
+def mask_to_ranges(mask):  # return list of (start, stop) runs of non zero bytes, stop is exclusive
+    ranges = []
+    start = mask.find(1)
+    while start >= 0:
+        stop = mask.find(0, start)
+        if stop < 0:
+            stop = len(mask)
+        ranges.append((start, stop))
+        start = mask.find(1, stop)
+    return ranges
+
+
+def _fill(mask, start, stop, step, value):  # set the pages of one term in the mask
+    pages = range(start, len(mask) if stop is None else min(stop, len(mask)), step)
+    if len(pages) > 0:  # slice assignments, the pages are not visited one by one
+        mask[pages.start:pages.stop:step] = bytes([value]) * len(pages)
+
+
+class PageRangeExpression(object):
+    def __init__(self, text):
+        self.text = text
+        self.terms = []  # (is excluded, start, stop or None, step)
+        self.numbered_terms = []  # (text, start, stop or None) of the numbers and ranges which add pages
+        for part in text.split(","):
+            part = part.strip()
+            if len(part) == 0:
+                continue
+            is_excluded = part.startswith("!")
+            if is_excluded:
+                part = part[1:].strip()
+                if len(part) == 0:
+                    raise ValueError("Wrong range !")
+            keyword = KEYWORDS.get(part.lower())
+            if keyword is not None:
+                start, stop, step = keyword
+            else:
+                start, stop = parse_range(part)
+                step = 1
+                if is_excluded is False:
+                    self.numbered_terms.append((part, start, stop))
+            self.terms.append((is_excluded, start, stop, step))
+        if len(self.terms) == 0:
+            raise ValueError("No pages in " + text)
+
+    def check_pages(self, pages_count):  # raise ValueError if a number or a range adds pages after the last page of the file
+        for text, start, stop in self.numbered_terms:
+            if start >= pages_count or (stop is not None and stop > pages_count):
+                raise ValueError("Wrong range " + text + ", the file has " + str(pages_count) + " pages")
+
+    def get_mask(self, pages_count):  # bytearray with 1 for the selected pages
+        mask = bytearray(b"\x01" if self.terms[0][0] else b"\x00") * pages_count
+        for is_excluded, start, stop, step in self.terms:
+            _fill(mask, start, stop, step, 0 if is_excluded else 1)
+        return mask
+
+    def get_ranges(self, pages_count):  # sorted list of (start, stop) runs of the selected pages, 0-based, stop is exclusive
+        return mask_to_ranges(self.get_mask(pages_count))
+
+    def get_ordered_ranges(self, pages_count):  # runs in the order of the terms, "5,1-3" is 5, 1, 2, 3 and "1,1" is two pages
+        masks = []  # one mask for every term which adds pages, a term with ! removes its pages from the terms before it
+        if self.terms[0][0]:
+            masks.append(bytearray(b"\x01") * pages_count)
+        for is_excluded, start, stop, step in self.terms:
+            if is_excluded:
+                for mask in masks:
+                    _fill(mask, start, stop, step, 0)
+            else:
+                mask = bytearray(pages_count)
+                _fill(mask, start, stop, step, 1)
+                masks.append(mask)
+        return [page_range for mask in masks for page_range in mask_to_ranges(mask)]
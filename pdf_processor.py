@@ -6,8 +6,7 @@ from PySide2.QtGui import QPalette, QColor
 from PySide2.QtCore import QEvent
 
 from tab_image_to_pdf import ImageToPdfWidget
-from tab_synth_pdf import SynthPdfWidget
-from processor_widgets import CreatePdfWidget
+from processor_widgets import CreatePdfWidget, LazyWidget
 
 
 class MainWindow(QMainWindow):
@@ -22,7 +21,7 @@ class MainWindow(QMainWindow):
         self.status_bar = self.statusBar()
         self.tab_widget = QTabWidget()
         self.tab_imageToPdf = ImageToPdfWidget(self.status_bar)
-        self.tab_extractPdf = SynthPdfWidget(self.status_bar)
+        self.tab_extractPdf = LazyWidget(self._create_synth_tab)  # the tab is created when it is opened for the first time
         self.tab_widget.addTab(self.tab_imageToPdf, "Image To Pdf")
         self.tab_widget.addTab(self.tab_extractPdf, "Synth Pdf")
 
@@ -33,6 +32,10 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(central_widget)
         self.resize(1280, 720)
 
+    def _create_synth_tab(self):
+        from tab_synth_pdf import SynthPdfWidget
+        return SynthPdfWidget(self.status_bar)
+
     def eventFilter(self, source, event):
         if event.type() == QEvent.MouseButtonPress:
             self.status_bar.showMessage("")
@@ -61,7 +64,7 @@ class MainWindow(QMainWindow):
         if tab_index == 0:  # this is img->pdf
             return (0, self.tab_imageToPdf.get_images_to_save(), self.tab_imageToPdf.get_image_parameters())
         elif tab_index == 1:  # this is synth pdf
-            return (1, self.tab_extractPdf.extern_get_files_and_pages())
+            return (1, self.tab_extractPdf.get_widget().extern_get_files_and_pages())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,67 @@
+import threading
+import importlib.util
+from collections import OrderedDict
+from reader_cache import get_file_key
+
+# pdf pages are rendered by PyMuPDF, it is optional, without it pages have no previews
+# PyMuPDF takes longer to import than the rest of the application, so it is imported by the first render
+fitz = None
+try:
+    _is_fitz_installed = importlib.util.find_spec("fitz") is not None
+except (ImportError, ValueError):  # fitz is blocked in sys.modules
+    _is_fitz_installed = False
+
+MAX_OPEN_DOCUMENTS = 4
+
+# PyMuPDF can not be used from several threads at once, so all renders share one lock and opened documents
+_render_lock = threading.Lock()
+_documents = OrderedDict()  # (path, mtime, size) -> fitz document
+
+
+def is_render_available():
+    return _is_fitz_installed
+
+
+def _load_fitz():  # call with the render lock, return False if PyMuPDF can not be imported
+    global fitz, _is_fitz_installed
+    if fitz is None and _is_fitz_installed:
+        try:
+            import fitz as fitz_module
+        except ImportError:
+            _is_fitz_installed = False
+            return False
+        fitz = fitz_module
+    return fitz is not None
+
+
+def _get_document(pdf_path):
+    key = get_file_key(pdf_path)
+    document = _documents.get(key)
+    if document is None:
+        document = fitz.open(key[0])
+        _documents[key] = document
+        while len(_documents) > MAX_OPEN_DOCUMENTS:
+            _documents.popitem(last=False)[1].close()
+    else:
+        _documents.move_to_end(key)
+    return document
+
+
+def close_documents():
+    with _render_lock:
+        while len(_documents) > 0:
+            _documents.popitem()[1].close()
+
+
+def render_page(pdf_path, page_index, size):  # return Pillow RGB image with the longest side equal to size, None if there is no renderer
+    if _is_fitz_installed is False:
+        return None
+    from PIL import Image
+    with _render_lock:
+        if _load_fitz() is False:
+            return None
+        page = _get_document(pdf_path).load_page(page_index)
+        rect = page.rect
+        zoom = size / max(rect.width, rect.height, 1)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
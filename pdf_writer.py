@@ -0,0 +1,370 @@
+import zlib
+import hashlib
+from io import BytesIO
+from PyPDF2.generic import DictionaryObject, ArrayObject, StreamObject, IndirectObject, NameObject
+
+# minimal pdf writer for pages with one pre-encoded image and for pages copied from other pdf files
+# objects are written to the output stream at once, only their offsets and id maps are stored in memory
+# images, page contents and copied objects are content addressed, equal objects are written once and shared by all pages
+
+MAX_COPY_DEPTH = 64  # deeper objects of the copied pages are written without deduplication
+
+
+def pdf_ref(obj_id):
+    return str(obj_id) + " 0 R"
+
+
+def pdf_number(value):
+    if isinstance(value, int):
+        return str(value)
+    text = ("%.4f" % value).rstrip("0").rstrip(".")
+    return text if text not in ("", "-0") else "0"
+
+
+def pdf_dict(entries):  # entries is a list of (key, value) pairs, values are already formatted pdf strings
+    return "<< " + " ".join("/" + k + " " + v for k, v in entries) + " >>"
+
+
+class PdfWriter(object):
+    def __init__(self, stream, state=None):  # state is returned by get_state(), then the writer continues the stream from its current position
+        self.stream = stream
+        self.offsets = {}  # object id -> offset in the stream
+        self.last_id = 0
+        self.page_ids = []
+        self.source_maps = {}  # source key -> {(source id, generation): output id}
+        self.pending_pages = {}  # output id -> (source key, source id, generation) for pages referenced from copied objects, but not copied yet
+        self.object_ids = {}  # sha1 digest of the object body -> output id
+        if state is None:
+            self.stream.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+            self.pages_id = self.reserve_id()
+            self.catalog_id = self.reserve_id()
+        else:
+            self._set_state(state)
+
+    def get_state(self):  # json compatible state of the writer, valid only between the pages
+        return {"last_id": self.last_id,
+                "pages_id": self.pages_id,
+                "catalog_id": self.catalog_id,
+                "offsets": [[obj_id, offset] for obj_id, offset in self.offsets.items()],
+                "page_ids": self.page_ids,
+                "source_maps": [[list(source_key), [[source_id, generation, obj_id] for (source_id, generation), obj_id in id_map.items()]] for source_key, id_map in self.source_maps.items()],
+                "pending_pages": [[obj_id, list(source_key), source_id, generation] for obj_id, (source_key, source_id, generation) in self.pending_pages.items()],
+                "object_ids": [[digest.hex(), obj_id] for digest, obj_id in self.object_ids.items()]}
+
+    def _set_state(self, state):
+        self.last_id = state["last_id"]
+        self.pages_id = state["pages_id"]
+        self.catalog_id = state["catalog_id"]
+        self.offsets = {obj_id: offset for obj_id, offset in state["offsets"]}
+        self.page_ids = list(state["page_ids"])
+        self.source_maps = {tuple(source_key): {(source_id, generation): obj_id for source_id, generation, obj_id in id_map} for source_key, id_map in state["source_maps"]}
+        self.pending_pages = {obj_id: (tuple(source_key), source_id, generation) for obj_id, source_key, source_id, generation in state["pending_pages"]}
+        self.object_ids = {bytes.fromhex(digest): obj_id for digest, obj_id in state.get("object_ids", [])}
+
+    def reserve_id(self):
+        self.last_id += 1
+        return self.last_id
+
+    def write_object(self, obj_id, body):
+        if isinstance(body, str):
+            body = body.encode("latin-1")
+        self.offsets[obj_id] = self.stream.tell()
+        self.stream.write(str(obj_id).encode() + b" 0 obj\n")
+        self.stream.write(body)
+        self.stream.write(b"\nendobj\n")
+
+    def write_stream_object(self, obj_id, entries, data):
+        self.offsets[obj_id] = self.stream.tell()
+        self.stream.write(str(obj_id).encode() + b" 0 obj\n" + self._get_stream_header(entries, data))
+        self.stream.write(data)
+        self.stream.write(b"\nendstream\nendobj\n")
+
+    def _get_stream_header(self, entries, data):
+        return pdf_dict(list(entries) + [("Length", str(len(data)))]).encode("latin-1") + b"\nstream\n"
+
+    def add_unique_object(self, body):  # write the object if the same body is not written yet, return its id
+        if isinstance(body, str):
+            body = body.encode("latin-1")
+        digest = hashlib.sha1(body).digest()
+        obj_id = self.object_ids.get(digest)
+        if obj_id is None:
+            obj_id = self.reserve_id()
+            self.object_ids[digest] = obj_id
+            self.write_object(obj_id, body)
+        return obj_id
+
+    def add_unique_stream_object(self, entries, data):  # the same as add_unique_object(), but the stream data is not copied to the body
+        digest = hashlib.sha1(self._get_stream_header(entries, data))
+        digest.update(data)
+        digest = digest.digest()
+        obj_id = self.object_ids.get(digest)
+        if obj_id is None:
+            obj_id = self.reserve_id()
+            self.object_ids[digest] = obj_id
+            self.write_stream_object(obj_id, entries, data)
+        return obj_id
+
+    def add_image(self, image):  # image is a dictionary returned by image_encoder.encode_image()
+        entries = [("Type", "/XObject"),
+                   ("Subtype", "/Image"),
+                   ("Width", str(image["width"])),
+                   ("Height", str(image["height"])),
+                   ("ColorSpace", "/" + image["color_space"]),
+                   ("BitsPerComponent", str(image["bits"])),
+                   ("Filter", "/" + image["filter"])]
+        if image.get("decode") is not None:
+            entries.append(("Decode", "[" + " ".join(pdf_number(v) for v in image["decode"]) + "]"))
+        return self.add_unique_stream_object(entries, image["data"])
+
+    def add_image_page(self, page_size, placement, image_id, background=None):
+        page_width, page_height = page_size
+        x, y, width, height = placement
+        content = []
+        if background is not None:
+            content.append("q " + " ".join(pdf_number(c / 255) for c in background) + " rg 0 0 " + pdf_number(page_width) + " " + pdf_number(page_height) + " re f Q")
+        content.append("q " + pdf_number(width) + " 0 0 " + pdf_number(height) + " " + pdf_number(x) + " " + pdf_number(y) + " cm /Im0 Do Q")
+        content_id = self.add_unique_stream_object([("Filter", "/FlateDecode")], zlib.compress("\n".join(content).encode("latin-1")))
+        page_id = self.reserve_id()
+        self.write_object(page_id, pdf_dict([("Type", "/Page"),
+                                             ("Parent", pdf_ref(self.pages_id)),
+                                             ("MediaBox", "[0 0 " + pdf_number(page_width) + " " + pdf_number(page_height) + "]"),
+                                             ("Resources", pdf_dict([("XObject", pdf_dict([("Im0", pdf_ref(image_id))])), ("ProcSet", "[/PDF /ImageB /ImageC]")])),
+                                             ("Contents", pdf_ref(content_id))]))
+        self.page_ids.append(page_id)
+        return page_id
+
+    def _serialize(self, obj, out, get_ref):  # write PyPDF2 object to out, indirect references are replaced by get_ref(reference)
+        if isinstance(obj, IndirectObject):
+            out.write(pdf_ref(get_ref(obj)).encode())
+        elif isinstance(obj, DictionaryObject):
+            out.write(b"<<")
+            is_stream = isinstance(obj, StreamObject)
+            for key, value in obj.items():
+                if is_stream and key == "/Length":
+                    continue
+                out.write(b"\n")
+                NameObject(key).writeToStream(out, None)
+                out.write(b" ")
+                self._serialize(value, out, get_ref)
+            if is_stream:
+                data = obj._data
+                out.write(b"\n/Length " + str(len(data)).encode() + b"\n>>\nstream\n")
+                out.write(data)
+                out.write(b"\nendstream")
+            else:
+                out.write(b"\n>>")
+        elif isinstance(obj, ArrayObject):
+            out.write(b"[")
+            for i, value in enumerate(obj):
+                if i > 0:
+                    out.write(b" ")
+                self._serialize(value, out, get_ref)
+            out.write(b"]")
+        else:
+            obj.writeToStream(out, None)
+
+    def add_source_page(self, source_key, reader, page):  # copy PyPDF2 page with all objects it uses, source_key identifies the source file
+        id_map = self.source_maps.setdefault(source_key, {})
+        in_progress = set()
+        queue = []
+
+        def get_ref(ref):
+            key = (ref.idnum, ref.generation)
+            obj_id = id_map.get(key)
+            if obj_id is not None:
+                return obj_id
+            if key in in_progress:  # a loop, the object gets own id and it is written without deduplication
+                obj_id = self.reserve_id()
+                id_map[key] = obj_id
+                return obj_id
+            obj = reader.getObject(ref)
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+                # links to other pages, write them only if these pages are copied too
+                obj_id = self.reserve_id()
+                id_map[key] = obj_id
+                self.pending_pages[obj_id] = (source_key, ref.idnum, ref.generation)
+                return obj_id
+            if len(in_progress) >= MAX_COPY_DEPTH:  # too long chain of objects, write the rest after the page
+                obj_id = self.reserve_id()
+                id_map[key] = obj_id
+                queue.append((ref, obj_id))
+                return obj_id
+            # objects are written after the objects they use, so equal objects of different sources have equal bodies
+            in_progress.add(key)
+            out = BytesIO()
+            self._serialize(obj, out, get_ref)
+            in_progress.discard(key)
+            obj_id = id_map.get(key)
+            if obj_id is None:
+                obj_id = self.add_unique_object(out.getvalue())
+                id_map[key] = obj_id
+            else:  # the object is referenced from the loop, so it already has own id
+                self.write_object(obj_id, out.getvalue())
+            return obj_id
+
+        page_ref = page.indirectRef
+        page_id = None
+        if page_ref is not None:
+            page_id = id_map.get((page_ref.idnum, page_ref.generation))
+            if page_id is not None and self.pending_pages.pop(page_id, None) is None:
+                page_id = None  # the page is already written, so this is a copy
+        if page_id is None:
+            page_id = self.reserve_id()
+            if page_ref is not None:
+                id_map[(page_ref.idnum, page_ref.generation)] = page_id
+        out = BytesIO()
+        out.write(b"<<\n/Parent " + pdf_ref(self.pages_id).encode())
+        for key, value in page.items():
+            if key != "/Parent":
+                out.write(b"\n")
+                NameObject(key).writeToStream(out, None)
+                out.write(b" ")
+                self._serialize(value, out, get_ref)
+        out.write(b"\n>>")
+        self.write_object(page_id, out.getvalue())
+        self.page_ids.append(page_id)
+        while len(queue) > 0:
+            ref, obj_id = queue.pop()
+            out = BytesIO()
+            self._serialize(reader.getObject(ref), out, get_ref)
+            self.write_object(obj_id, out.getvalue())
+        return page_id
+
+    def _write_pending_pages(self):
+        for obj_id in self.pending_pages.keys():
+            self.write_object(obj_id, "null")
+        self.pending_pages = {}
+
+    def _write_xref(self, xref_ids, trailer_entries):  # xref_ids are sorted ids of this xref section
+        xref_offset = self.stream.tell()
+        lines = ["xref"]
+        start = 0
+        while start < len(xref_ids):  # one subsection for every run of consecutive ids
+            stop = start + 1
+            while stop < len(xref_ids) and xref_ids[stop] == xref_ids[stop - 1] + 1:
+                stop += 1
+            lines.append(str(xref_ids[start]) + " " + str(stop - start))
+            for obj_id in xref_ids[start:stop]:
+                offset = self.offsets.get(obj_id)
+                if offset is None:  # reserved, but not used, and the object 0
+                    lines.append("0000000000 65535 f ")
+                else:
+                    lines.append("%010d 00000 n " % offset)
+            start = stop
+        lines.append("trailer")
+        lines.append(pdf_dict([("Size", str(self.last_id + 1))] + trailer_entries))
+        lines.append("startxref")
+        lines.append(str(xref_offset))
+        lines.append("%%EOF\n")
+        self.stream.write("\n".join(lines).encode("latin-1"))
+
+    def close(self):
+        self._write_pending_pages()
+        self.write_object(self.pages_id, pdf_dict([("Type", "/Pages"),
+                                                   ("Kids", "[" + " ".join(pdf_ref(i) for i in self.page_ids) + "]"),
+                                                   ("Count", str(len(self.page_ids)))]))
+        self.write_object(self.catalog_id, pdf_dict([("Type", "/Catalog"), ("Pages", pdf_ref(self.pages_id))]))
+        self._write_xref(list(range(self.last_id + 1)), [("Root", pdf_ref(self.catalog_id))])
+
+
+def get_startxref(stream):  # offset of the last xref section of the pdf file
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(max(0, size - 1024))
+    tail = stream.read()
+    position = tail.rfind(b"startxref")
+    if position < 0:
+        raise ValueError("startxref is not found")
+    return int(tail[position + 9:].split()[0])
+
+
+class PdfAppendWriter(PdfWriter):
+    # writes new pages as an incremental update of the existing file: new objects, new version of the root pages object
+    # and the xref section of these objects are appended to the end of the file, the old bytes are not changed
+    def __init__(self, stream, reader=None, state=None):  # reader is PyPDF2 reader of the same file, stream is opened for update
+        if state is None:
+            self.stream = stream
+            self._read_base(reader)
+            self.stream.seek(0, 2)
+            self.stream.write(b"\n")  # the old file may end without the line break
+        super(PdfAppendWriter, self).__init__(stream, state if state is not None else self.get_state())
+
+    def _read_base(self, reader):
+        trailer = reader.trailer
+        if "/Encrypt" in trailer:
+            raise ValueError("Pages can not be appended to encrypted pdf")
+        root_ref = trailer.raw_get("/Root")
+        pages_ref = reader.getObject(root_ref).raw_get("/Pages")
+        if root_ref.generation != 0 or pages_ref.generation != 0:
+            raise ValueError("Pages can not be appended, the catalog or the page tree root has non-zero generation")
+        base_pages = reader.getObject(pages_ref)
+        out = BytesIO()
+        for key, value in base_pages.items():
+            if key not in ("/Kids", "/Count"):
+                out.write(b"\n")
+                NameObject(key).writeToStream(out, None)
+                out.write(b" ")
+                self._serialize(value, out, lambda ref: ref.idnum)  # references to the same file are not changed
+        self.base_entries = out.getvalue().decode("latin-1")
+        self.base_kids = [kid.idnum for kid in base_pages.raw_get("/Kids")]
+        self.base_count = base_pages["/Count"]
+        trailer_entries = []
+        for key in ("/Info", "/ID"):
+            if key in trailer:
+                out = BytesIO()
+                self._serialize(trailer.raw_get(key), out, lambda ref: ref.idnum)
+                trailer_entries.append([key[1:], out.getvalue().decode("latin-1")])
+        self.trailer_entries = trailer_entries
+        self.prev_xref = get_startxref(self.stream)
+        self.catalog_id = root_ref.idnum
+        self.pages_id = pages_ref.idnum
+        self.first_id = self._get_base_size(reader, trailer)
+        self.last_id = self.first_id - 1
+        self.offsets = {}
+        self.page_ids = []
+        self.source_maps = {}
+        self.pending_pages = {}
+        self.object_ids = {}
+
+    def _get_base_size(self, reader, trailer):  # the first free object id of the file
+        # PyPDF2 does not keep /Size of the cross-reference streams, so take the biggest known id,
+        # the stream object itself may be not listed in its own index
+        size = trailer.get("/Size", 0)
+        for ids in reader.xref.values():
+            if len(ids) > 0:
+                size = max(size, max(ids) + 1)
+        if len(reader.xref_objStm) > 0:
+            size = max(size, max(reader.xref_objStm) + 1)
+        self.stream.seek(self.prev_xref)
+        header = self.stream.read(32).split()
+        if len(header) > 1 and header[0].isdigit() and header[1].isdigit():  # "id generation obj" of the xref stream
+            size = max(size, int(header[0]) + 1)
+        return size
+
+    def get_state(self):
+        state = super(PdfAppendWriter, self).get_state()
+        state["base"] = {"entries": self.base_entries,
+                         "kids": self.base_kids,
+                         "count": self.base_count,
+                         "trailer": self.trailer_entries,
+                         "prev_xref": self.prev_xref,
+                         "first_id": self.first_id}
+        return state
+
+    def _set_state(self, state):
+        super(PdfAppendWriter, self)._set_state(state)
+        base = state["base"]
+        self.base_entries = base["entries"]
+        self.base_kids = base["kids"]
+        self.base_count = base["count"]
+        self.trailer_entries = base["trailer"]
+        self.prev_xref = base["prev_xref"]
+        self.first_id = base["first_id"]
+
+    def close(self):
+        self._write_pending_pages()
+        # the new version of the page tree root keeps its id, so the catalog does not change
+        kids = self.base_kids + self.page_ids
+        self.write_object(self.pages_id, "<<" + self.base_entries + "\n/Kids [" + " ".join(pdf_ref(i) for i in kids) + "]\n/Count " + str(self.base_count + len(self.page_ids)) + "\n>>")
+        self._write_xref([0, self.pages_id] + list(range(self.first_id, self.last_id + 1)),
+                         [("Root", pdf_ref(self.catalog_id)), ("Prev", str(self.prev_xref))] + [tuple(e) for e in self.trailer_entries])
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import argparse
+from multiprocessing import Pool
+from reader_cache import get_reader_cache, MAX_OPEN_FILES
+from page_plan import PagePlan
+from page_ranges import PageRangeExpression
+from file_ingest import find_files, IMAGE_EXTENSIONS, PDF_EXTENSIONS
+from image_encoder import JPEG_QUALITY
+from job_metrics import METRICS_LOG_ENV
+from processor_engine import run_job, get_default_image_parameters, MODE_NAMES, ALIGN_NAMES
+
+
+def parse_color(string):
+    parts = [int(v) for v in string.split(",")]
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError("color should be in the form r,g,b")
+    return tuple(parts)
+
+
+def parse_pages_spec(spec):  # "file.pdf" or "file.pdf:1-50,80-,odd,!3-7", return (file, PageRangeExpression or None for all pages)
+    drive, rest = os.path.splitdrive(spec)  # ":" of a windows drive letter does not start the pages
+    path, separator, ranges = rest.rpartition(":")
+    if len(separator) == 0 or len(path) == 0 or os.path.exists(spec):  # all pages, or ":" is a part of the file name
+        return (spec, None)
+    return (drive + path, PageRangeExpression(ranges))  # ValueError for wrong ranges
+
+
+def read_jobs(path):  # json list of jobs or json lines file with one job per line
+    with open(path, "r") as file:
+        text = file.read()
+    stripped = text.strip()
+    if stripped.startswith("["):
+        return json.loads(stripped)
+    return [json.loads(line) for line in text.splitlines() if len(line.strip()) > 0]
+
+
+def images_job(args):
+    params = get_default_image_parameters(MODE_NAMES[args.mode])
+    if args.margin is not None:
+        params["margin"] = args.margin
+    if args.background is not None:
+        params["background"] = args.background
+    params["workers"] = args.workers
+    params["streaming"] = args.streaming
+    params["checkpoint"] = args.checkpoint
+    params["append"] = args.append
+    params["dpi"] = args.dpi
+    params["compression"] = args.compression
+    params["quality"] = args.quality
+    if params["mode"] == 0:
+        params["pixels"] = args.pixels
+    else:
+        params["align"] = ALIGN_NAMES[args.align]
+    return {"type": "images", "output": args.output, "images": find_files(args.images, IMAGE_EXTENSIONS), "parameters": params}
+
+
+def get_page_plan(pdfs):
+    page_plan = PagePlan()
+    for spec in pdfs:
+        path, expression = parse_pages_spec(spec)
+        if expression is None:
+            for pdf_path in find_files([path], PDF_EXTENSIONS):
+                page_plan.add_range(pdf_path, 0, get_reader_cache().get_pages_count(pdf_path))
+        else:  # selected pages are added in the typed order, repeated pages are kept
+            pages_count = get_reader_cache().get_pages_count(path)
+            expression.check_pages(pages_count)
+            for start, stop in expression.get_ordered_ranges(pages_count):
+                page_plan.add_range(path, start, stop)
+    return page_plan
+
+
+def pages_job(args):
+    return {"type": "pages", "output": args.output, "pages": get_page_plan(args.pdfs).to_data(), "streaming": args.streaming, "checkpoint": args.checkpoint, "append": args.append}
+
+
+def burst_job(args):
+    if args.every is not None:
+        split_rule, split_value = ("pages", args.every)
+    elif args.ranges is not None:
+        split_rule, split_value = ("ranges", args.ranges)
+    else:
+        split_rule, split_value = (args.by, None)
+    return {"type": "burst", "output": args.output, "pages": get_page_plan(args.pdfs).to_data(), "split": split_rule, "split_value": split_value, "workers": args.workers}
+
+
+def _run_job_quiet(data):
+    try:
+        return (True, run_job(data))
+    except Exception as e:
+        return (False, data.get("output", "") + ": " + str(e))
+
+
+def print_step(step):
+    print("Create " + str(step[0]) + " page from " + str(step[1]) + " total pages")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="processor_cli", description="Create pdf files from images and pages of other pdf files without gui")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print progress")
+    parser.add_argument("--max-open-files", type=int, default=MAX_OPEN_FILES, help="number of source pdf files kept open and parsed")
+    parser.add_argument("--metrics-log", default=None, help="append timings of the job stages for every page to this json lines file")
+    subparsers = parser.add_subparsers(dest="command")
+
+    images_parser = subparsers.add_parser("images", help="create pdf from images")
+    images_parser.add_argument("-o", "--output", required=True)
+    images_parser.add_argument("--mode", choices=sorted(MODE_NAMES.keys()), default="from-source")
+    images_parser.add_argument("--pixels", type=int, default=10, help="pixels per unit for from-source mode")
+    images_parser.add_argument("--align", choices=sorted(ALIGN_NAMES.keys()), default="center")
+    images_parser.add_argument("--margin", type=int, default=None)
+    images_parser.add_argument("--background", type=parse_color, default=None, help="r,g,b")
+    images_parser.add_argument("-w", "--workers", type=int, default=1, help="number of processes for image encoding")
+    images_parser.add_argument("--streaming", action="store_true", help="write every page to the file as soon as it is ready")
+    images_mode_group = images_parser.add_mutually_exclusive_group()
+    images_mode_group.add_argument("--checkpoint", action="store_true", help="save the progress to output.part, the same command continues from the last saved page")
+    images_mode_group.add_argument("--append", action="store_true", help="add pages to the end of the existing output file as an incremental update")
+    images_parser.add_argument("--dpi", type=int, default=0, help="downsample images to this resolution of their size on the page, 0 keeps the source resolution")
+    images_parser.add_argument("--compression", choices=["flate", "jpeg"], default="flate", help="compression of decoded images, jpeg files which are not downsampled are embedded as they are")
+    images_parser.add_argument("--quality", type=int, default=JPEG_QUALITY, help="jpeg quality from 1 to 100")
+    images_parser.add_argument("images", nargs="+", help="image files, folders or glob patterns (\"scans/**/*.png\"), found files are sorted in the natural order")
+
+    pages_parser = subparsers.add_parser("pages", help="create pdf from pages of other pdf files")
+    pages_parser.add_argument("-o", "--output", required=True)
+    pages_parser.add_argument("--streaming", action="store_true", default=True, help="write every page to the file as soon as it is ready (default)")
+    pages_parser.add_argument("--in-memory", dest="streaming", action="store_false", help="build the whole document with PyPDF2 before writing it")
+    pages_mode_group = pages_parser.add_mutually_exclusive_group()
+    pages_mode_group.add_argument("--checkpoint", action="store_true", help="save the progress to output.part, the same command continues from the last saved page")
+    pages_mode_group.add_argument("--append", action="store_true", help="add pages to the end of the existing output file as an incremental update")
+    pages_parser.add_argument("pdfs", nargs="+", help="file.pdf, folder or glob pattern for all pages or file.pdf:1-50,80-,odd,!3-7 for selected pages")
+
+    burst_parser = subparsers.add_parser("burst", help="split pages of pdf files to many pdf files")
+    burst_parser.add_argument("-o", "--output", required=True, help="name pattern, out.pdf is split to out_001.pdf, out_002.pdf, ...")
+    split_group = burst_parser.add_mutually_exclusive_group(required=True)
+    split_group.add_argument("--every", type=int, default=None, help="number of pages in every file")
+    split_group.add_argument("--by", choices=["sources", "bookmarks"], default=None, help="new file for every source file or for every top level bookmark")
+    split_group.add_argument("--ranges", default=None, help="pages of the files, \"1-100,101-250,251-\" is three files")
+    burst_parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="number of processes writing the files")
+    burst_parser.add_argument("pdfs", nargs="+", help="file.pdf, folder or glob pattern for all pages or file.pdf:1-50,80-,odd,!3-7 for selected pages")
+
+    batch_parser = subparsers.add_parser("batch", help="run jobs from json file")
+    batch_parser.add_argument("-j", "--jobs", type=int, default=1, help="number of parallel processes")
+    batch_parser.add_argument("files", nargs="+", help="json list of jobs or json lines file")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    get_reader_cache().set_max_open_files(args.max_open_files)
+    if args.metrics_log is not None:
+        os.environ[METRICS_LOG_ENV] = os.path.abspath(args.metrics_log)  # batch workers inherit it
+    step_callback = None if args.quiet else print_step
+    message_callback = None if args.quiet else print
+
+    if args.command in ("images", "pages", "burst"):
+        try:
+            data = {"images": images_job, "pages": pages_job, "burst": burst_job}[args.command](args)
+        except ValueError as e:  # wrong page ranges
+            parser.error(str(e))
+        run_job(data, step_callback, message_callback)
+    elif args.command == "batch":
+        jobs = []
+        for path in args.files:
+            jobs.extend(read_jobs(path))
+        if args.jobs > 1:
+            with Pool(args.jobs) as pool:
+                results = pool.map(_run_job_quiet, jobs, chunksize=1)
+        else:
+            results = [_run_job_quiet(data) for data in jobs]
+        errors = 0
+        for is_ok, result in results:
+            if is_ok is False:
+                errors += 1
+                print("Error " + result, file=sys.stderr)
+            elif message_callback is not None:
+                message_callback("Save file " + result)
+        if errors > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
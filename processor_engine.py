@@ -0,0 +1,566 @@
+import os
+import re
+import json
+import time
+import threading
+from glob import glob, escape
+from itertools import count
+from bisect import bisect_left
+from multiprocessing import get_context, current_process
+from image_encoder import encode_image_task, get_image_size, JPEG_QUALITY
+from reader_cache import get_reader_cache, get_file_key, CachedReader
+from page_plan import PagePlan
+from layout_plan import compute_layout
+from page_ranges import parse_range
+from job_metrics import JobMetrics
+
+# qt-free part of the processor, jobs are described by plain data (dicts, lists and strings)
+# so they can be created from the gui, from the command line or from json files
+# PyPDF2, the pdf writers and the reportlab canvas are imported by the jobs which use them, so the gui starts without them
+
+MODE_NAMES = {"from-source": 0, "a4": 1, "a5": 2, "a6": 3, "letter": 4}
+ALIGN_NAMES = {"center": 0, "center-top": 1, "center-bottom": 2, "left-top": 3, "left-center": 4, "left-bottom": 5, "right-top": 6, "right-center": 7, "right-bottom": 8}
+CHECKPOINT_INTERVAL = 2.0  # seconds between saves of the writer state in the checkpoint mode
+SPLIT_RULES = ("pages", "sources", "bookmarks", "ranges")  # how BurstPdfJob splits the pages to files
+MAX_LABEL_LENGTH = 60  # characters of the bookmark title or the source name in the names of the split files
+BURST_PAGES_PER_WORKER = 2000  # a worker process starts and parses its sources for about the time of copying so many pages
+
+_temp_numbers = count()  # numbers of the temporary files of this process
+
+
+def open_temp_file(file_path):  # return (path, stream) of a new file next to file_path, named file.pdf.<pid>.<number>.tmp
+    # every job has own temporary file, so jobs with the same output do not write to one file
+    # not tempfile.mkstemp(), the output file would keep the owner only permissions of its temporary file
+    while True:
+        temp_path = file_path + "." + str(os.getpid()) + "." + str(next(_temp_numbers)) + ".tmp"
+        try:
+            return (temp_path, open(temp_path, "xb"))
+        except FileExistsError:  # left by a crashed process with the same id
+            continue
+
+
+def get_default_image_parameters(mode=0):
+    if mode == 0:
+        return {"mode": 0, "pixels": 10, "margin": 0, "background": (255, 255, 255), "workers": 1, "streaming": False, "checkpoint": False, "append": False, "dpi": 0, "compression": "flate", "quality": JPEG_QUALITY}
+    else:
+        return {"mode": mode, "align": 0, "margin": 50, "background": (255, 255, 255), "workers": 1, "streaming": False, "checkpoint": False, "append": False, "dpi": 0, "compression": "flate", "quality": JPEG_QUALITY}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class ProcessorJob(object):
+    def __init__(self, file_path, checkpoint=False, append=False):
+        if checkpoint and append:  # a cancelled job would leave an update without the xref section at the end of the file
+            raise ValueError("Checkpoint and append modes can not be used together")
+        self.file_path = file_path
+        self.checkpoint = checkpoint  # write file_path.part and save the state to resume from it after a crash or a cancel
+        self.append = append  # add pages to the existing file_path as an incremental update
+        self._step_callback = None
+        self._message_callback = None
+        self._cancel_event = threading.Event()
+        self.metrics_log = None  # json lines file for the metrics, by default the file from PDF_PROCESSOR_METRICS_LOG environment variable
+        self.metrics = None  # JobMetrics of the last run
+
+    def cancel(self):  # can be called from any thread, the job stops before the next page
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _step(self, current, total, pages=1):  # pages is the number of pages done since the previous step
+        if self._cancel_event.is_set():
+            raise JobCancelled("Job is cancelled at page " + str(current) + " from " + str(total))
+        self.metrics.pages += pages
+        if self._step_callback is not None:
+            self._step_callback((current, total))
+
+    def _message(self, message):
+        if self._message_callback is not None:
+            self._message_callback(message)
+
+    def run(self, step_callback=None, message_callback=None):
+        self._step_callback = step_callback
+        self._message_callback = message_callback
+        base_size = os.path.getsize(self.file_path) if self.append and os.path.exists(self.file_path) else 0
+        self.metrics = JobMetrics(self.file_path, self.metrics_log)
+        self.metrics.start()
+        self._run()
+        self.metrics.finish(self.get_output_size() - base_size)
+        self._message(self.metrics.get_summary())
+
+    def get_output_size(self):
+        return os.path.getsize(self.file_path)
+
+    def _run(self):
+        pass
+
+    def to_data(self):
+        return {}
+
+
+class StreamingOutput(object):
+    # output file of PdfWriter, use it as context manager around the writing of pages
+    # in the checkpoint mode pages are written to file.pdf.part, and from time to time the writer state is saved to file.pdf.part.json
+    # the next run of the same job continues the part file from the last saved page, the file is renamed when it is complete
+    # in the append mode pages are added to the existing file as an incremental update, on errors the file is cut to its old size
+    # otherwise pages are written to a temporary file of the job, the output file can be a mapped source of the job until it is replaced
+    def __init__(self, job):
+        self.job = job
+        self.is_append = job.append and os.path.exists(job.file_path)
+        if self.is_append:
+            self.part_path = job.file_path
+        else:
+            self.part_path = job.file_path + ".part" if job.checkpoint else None  # the temporary file is created by __enter__()
+        self.state_path = job.file_path + ".part.json"
+        self.stream = None
+        self.writer = None
+        self.base_length = 0
+        self.pages_done = 0
+        self.last_save = time.monotonic()
+
+    def _load_state(self):  # return saved state if it is made by the same job, otherwise None
+        try:
+            with open(self.state_path, "r") as file:
+                state = json.load(file)
+            if state.get("job") != json.loads(json.dumps(self.job.to_data())):
+                return None
+            if os.path.getsize(self.part_path) < state["length"]:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return state
+
+    def save_state(self):
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        state = {"job": self.job.to_data(), "pages": self.pages_done, "length": self.stream.tell(), "writer": self.writer.get_state()}
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(temp_path, self.state_path)
+        self.last_save = time.monotonic()
+
+    def page_done(self):
+        self.pages_done += 1
+        if self.job.checkpoint and time.monotonic() - self.last_save > CHECKPOINT_INTERVAL:
+            self.save_state()
+
+    def _open_append(self):
+        from pdf_writer import PdfAppendWriter
+        base = CachedReader(get_file_key(self.job.file_path))  # own reader, the file is changed after the job
+        try:
+            self.stream = open(self.part_path, "r+b")
+            self.base_length = self.stream.seek(0, 2)
+            self.writer = PdfAppendWriter(self.stream, base.reader)
+        finally:
+            base.close()
+
+    def __enter__(self):
+        from pdf_writer import PdfWriter
+        state = self._load_state() if self.job.checkpoint else None
+        if state is not None:
+            self.stream = open(self.part_path, "r+b")
+            self.stream.truncate(state["length"])  # objects of the pages written after the last save
+            self.stream.seek(state["length"])
+            self.writer = PdfWriter(self.stream, state["writer"])
+            self.pages_done = state["pages"]
+            self.job._message("Resume from page " + str(self.pages_done + 1))
+        elif self.is_append:
+            self._open_append()
+        elif self.job.checkpoint:
+            self.stream = open(self.part_path, "wb")
+            self.writer = PdfWriter(self.stream)
+        else:
+            self.part_path, self.stream = open_temp_file(self.job.file_path)
+            self.writer = PdfWriter(self.stream)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            with self.job.metrics.stage("write"):
+                self.writer.close()
+                self.stream.close()
+            if self.part_path != self.job.file_path:
+                os.replace(self.part_path, self.job.file_path)
+            if self.job.checkpoint and os.path.exists(self.state_path):
+                os.remove(self.state_path)
+            return False
+        if self.stream is None:  # the file is not opened
+            return False
+        if self.job.checkpoint:
+            # cancel stops the job between pages, so the state is valid, after other errors the last saved state is used
+            if issubclass(exc_type, JobCancelled):
+                self.save_state()
+            self.stream.close()
+        elif self.is_append:
+            self.stream.truncate(self.base_length)
+            self.stream.close()
+        else:
+            self.stream.close()
+            os.remove(self.part_path)
+        return False
+
+
+class ImagesToPdfJob(ProcessorJob):
+    def __init__(self, file_path, path_array, img_params):
+        super(ImagesToPdfJob, self).__init__(file_path, img_params.get("checkpoint", False), img_params.get("append", False))
+        self.path_array = list(path_array)
+        self.img_params = img_params
+
+    def _run(self):
+        workers = self.img_params.get("workers", 1)
+        # daemonic processes (for example batch workers) can not start own pools
+        if workers > 1 and len(self.path_array) > 1 and current_process().daemon is False:
+            self._run_streaming(workers)
+        elif self.img_params.get("streaming", False) or self.checkpoint or self.append or self._is_resampled():
+            self._run_streaming(1)
+        else:
+            self._run_serial()
+
+    def _is_resampled(self):  # the reportlab canvas embeds images only as they are
+        return self.img_params.get("dpi", 0) > 0 or self.img_params.get("compression", "flate") != "flate"
+
+    def _get_layout(self, path_array):  # image sizes are read from the file headers, then the layout of all pages is computed at once
+        with self.metrics.stage("open"):
+            sizes = {}
+            for img_path in path_array:
+                if img_path not in sizes:
+                    sizes[img_path] = get_image_size(img_path)
+        with self.metrics.stage("layout"):
+            return compute_layout([sizes[p] for p in path_array], self.img_params)
+
+    def _get_encode_task(self, img_path, placement):  # arguments of image_encoder.encode_image_task()
+        dpi = self.img_params.get("dpi", 0)
+        target_size = None
+        if dpi > 0:  # size of the image on the page in pixels of the target dpi, pdf units are 1/72 inch
+            x, y, img_width, img_height = placement
+            target_size = (max(1, round(img_width * dpi / 72)), max(1, round(img_height * dpi / 72)))
+        return (img_path, target_size, self.img_params.get("compression", "flate"), self.img_params.get("quality", JPEG_QUALITY))
+
+    def _run_serial(self):
+        from reportlab.pdfgen import canvas
+        canv = canvas.Canvas(self.file_path)
+        background = self.img_params["background"]
+        margin = self.img_params["margin"]
+        pages = len(self.path_array)
+        metrics = self.metrics
+        layout = self._get_layout(self.path_array)
+        for i in range(pages):
+            self._step(i + 1, pages)
+            img_path = self.path_array[i]
+            metrics.bytes_read += os.path.getsize(img_path)
+            page_size, (x, y, img_width, img_height) = layout.get_page(i)
+            with metrics.stage("assemble", i + 1):  # reportlab decodes and encodes images here
+                canv.setPageSize(page_size)
+                if margin > 0:
+                    canv.setFillColorRGB(background[0] / 255, background[1] / 255, background[2] / 255)
+                    canv.rect(0, 0, page_size[0], page_size[1], stroke=0, fill=1)
+                canv.drawImage(img_path, x, y, img_width, img_height)
+                canv.showPage()
+        self._message("Save file " + self.file_path)
+        with metrics.stage("write"):
+            canv.save()
+
+    def _run_streaming(self, workers):  # every page is written as soon as its image is encoded
+        with StreamingOutput(self) as output:
+            path_array = self.path_array[output.pages_done:]
+            layout = self._get_layout(path_array)
+            first_pages = {}  # image path -> index of its first page in path_array, repeated images are encoded and written once
+            for i, img_path in enumerate(path_array):
+                first_pages.setdefault(img_path, i)
+            tasks = [self._get_encode_task(p, layout.get_page(i)[1]) for p, i in first_pages.items()]
+            if workers > 1 and len(tasks) > 1:
+                # images are decoded and encoded in worker processes, here we only write them in the list order
+                # spawn is safe to use from the gui thread and works the same way on all platforms
+                with get_context("spawn").Pool(min(workers, len(tasks))) as pool:
+                    self._write_images(output, path_array, layout, pool.imap(encode_image_task, tasks))
+            else:
+                self._write_images(output, path_array, layout, map(encode_image_task, tasks))
+
+    def _write_images(self, output, path_array, layout, images):  # images are encoded images of path_array without repeats
+        background = self.img_params["background"] if self.img_params["margin"] > 0 else None
+        pages = len(self.path_array)
+        writer = output.writer
+        metrics = self.metrics
+        written = {}  # image path -> image id
+        first_page = output.pages_done + 1  # path_array starts after the pages written before the resume
+        for i, img_path in enumerate(path_array):
+            page = first_page + i
+            self._step(page, pages)
+            image_id = written.get(img_path)
+            if image_id is None:
+                image = next(images)  # stages of the encoding are measured where the image is encoded
+                metrics.add_times(image["timings"], page)
+                metrics.bytes_read += os.path.getsize(img_path)
+                with metrics.stage("assemble", page):
+                    image_id = writer.add_image(image)
+                written[img_path] = image_id
+            # the layout is made from the source sizes, so downsampled images are placed the same way as the source images
+            page_size, placement = layout.get_page(i)
+            with metrics.stage("assemble", page):
+                writer.add_image_page(page_size, placement, image_id, background)
+            output.page_done()
+        self._message("Save file " + self.file_path)
+
+    def to_data(self):
+        return {"type": "images", "output": self.file_path, "images": self.path_array, "parameters": self.img_params}
+
+
+class PagesToPdfJob(ProcessorJob):
+    def __init__(self, file_path, page_plan, streaming=True, checkpoint=False, append=False):
+        super(PagesToPdfJob, self).__init__(file_path, checkpoint, append)
+        self.page_plan = PagePlan.from_data(page_plan)
+        self.streaming = streaming
+        self.total_pages = len(self.page_plan)
+
+    def _run(self):
+        if self.streaming or self.checkpoint or self.append:
+            self._run_streaming()
+        else:
+            self._run_in_memory()
+
+    def _run_streaming(self):  # pages are copied to the output file one by one, source files are used only while their run is written
+        cache = get_reader_cache()
+        metrics = self.metrics
+        read_keys = set()  # source files are counted in bytes_read once
+        iterator = 0
+        with StreamingOutput(self) as output:
+            writer = output.writer
+            for source_id, start, stop in self.page_plan.runs():
+                if iterator + stop - start <= output.pages_done:  # the run is written before the resume
+                    iterator += stop - start
+                    continue
+                first = start + max(0, output.pages_done - iterator)
+                iterator += first - start
+                open_start = time.perf_counter()
+                with cache.open_reader(self.page_plan.sources[source_id]) as entry:
+                    metrics.add_time("open", time.perf_counter() - open_start, iterator + 1)
+                    if entry.key not in read_keys:
+                        read_keys.add(entry.key)
+                        metrics.bytes_read += entry.key[2]
+                    with entry.lock:
+                        for p in range(first, stop):
+                            iterator += 1
+                            self._step(iterator, self.total_pages)
+                            with metrics.stage("decode", iterator):
+                                page = entry.reader.getPage(p)
+                            with metrics.stage("assemble", iterator):
+                                writer.add_source_page(entry.key, entry.reader, page)
+                            output.page_done()
+            self._message("Save file " + self.file_path)
+
+    def _run_in_memory(self):  # builds the whole document with PdfFileWriter, sources are parsed again by own readers
+        from PyPDF2 import PdfFileWriter
+        writer = PdfFileWriter()
+        metrics = self.metrics
+        iterator = 0
+        # PdfFileWriter changes objects of the source readers (parents of the pages and references in write()),
+        # so own readers are used instead of the shared cache, they are kept open until the end of write()
+        readers = {}
+        temp_path = None  # the output file can be one of the mapped sources, it is replaced at the end
+        try:
+            for source_id, start, stop in self.page_plan.runs():
+                entry = readers.get(source_id)
+                if entry is None:
+                    with metrics.stage("open", iterator + 1):
+                        entry = CachedReader(get_file_key(self.page_plan.sources[source_id]))
+                    readers[source_id] = entry
+                    metrics.bytes_read += entry.key[2]
+                for p in range(start, stop):
+                    iterator += 1
+                    self._step(iterator, self.total_pages)
+                    with metrics.stage("decode", iterator):
+                        page = entry.reader.getPage(p)
+                    with metrics.stage("assemble", iterator):
+                        writer.addPage(page)
+            temp_path, output_stream = open_temp_file(self.file_path)
+            with output_stream:
+                self._message("Save file " + self.file_path)
+                with metrics.stage("write"):  # objects of the pages are read from the sources and written here
+                    writer.write(output_stream)
+        except BaseException:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            for entry in readers.values():
+                entry.close()
+        os.replace(temp_path, self.file_path)
+
+    def to_data(self):
+        return {"type": "pages", "output": self.file_path, "pages": self.page_plan.to_data(), "streaming": self.streaming, "checkpoint": self.checkpoint, "append": self.append}
+
+
+def parse_split_ranges(spec, pages_count):
+    # "1-100, 101-250, 251-" is three files, numbers are 1-based positions in the page plan, open ranges go to the first or the last page
+    ranges = []
+    for part in spec.split(","):
+        if len(part.strip()) > 0:
+            start, stop = parse_range(part)
+            stop = pages_count if stop is None else min(stop, pages_count)
+            if start < stop:
+                ranges.append((start, stop))
+    return ranges
+
+
+def split_page_plan(page_plan, rule, value=None):  # return list of (label or None, PagePlan) for every output file
+    pages_count = len(page_plan)
+    if rule == "pages":  # every value pages
+        size = max(1, int(value))
+        return [(None, plan) for plan in page_plan.slices([(s, min(s + size, pages_count)) for s in range(0, pages_count, size)])]
+    elif rule == "ranges":
+        return [(None, plan) for plan in page_plan.slices(parse_split_ranges(value, pages_count))]
+    elif rule not in SPLIT_RULES:
+        raise ValueError("Unsupported split rule " + str(rule))
+    starts = []  # (position in the plan, label) of the first pages of the files
+    bookmarks = {}  # source id -> (sorted pages, titles) of the top level bookmarks
+    last_source_id = None
+    for offset, (source_id, start, stop) in zip(page_plan.get_run_offsets(), page_plan.runs()):
+        pdf_path = page_plan.sources[source_id]
+        if rule == "sources":
+            if source_id != last_source_id:
+                starts.append((offset, os.path.splitext(os.path.basename(pdf_path))[0]))
+            last_source_id = source_id
+        else:  # a new file starts at every page with a top level bookmark
+            if source_id not in bookmarks:
+                source_bookmarks = get_reader_cache().get_bookmarks(pdf_path)
+                bookmarks[source_id] = ([b[0] for b in source_bookmarks], [b[1] for b in source_bookmarks])
+            pages, titles = bookmarks[source_id]
+            i = bisect_left(pages, start)
+            while i < len(pages) and pages[i] < stop:
+                if len(starts) == 0 or starts[-1][0] != offset + pages[i] - start:  # the first of several bookmarks of one page
+                    starts.append((offset + pages[i] - start, titles[i]))
+                i += 1
+    if len(starts) == 0 or starts[0][0] > 0:
+        starts.insert(0, (0, None))
+    bounds = [position for position, label in starts] + [pages_count]
+    plans = page_plan.slices(zip(bounds[:-1], bounds[1:]))
+    return [(label, plan) for (position, label), plan in zip(starts, plans) if len(plan) > 0]
+
+
+_burst_cancel_event = None  # cancel event of the burst job in its worker processes, set by _init_burst_worker()
+
+
+def _init_burst_worker(cancel_event):
+    global _burst_cancel_event
+    _burst_cancel_event = cancel_event
+
+
+def _write_burst_part(task, cancel_event=None):  # task is (output path, page plan data), return (output path, stage times, pages count)
+    # every worker process has own reader cache, so sources of the parts written by the process are parsed only once
+    file_path, plan_data = task
+    job = PagesToPdfJob(file_path, plan_data, streaming=True)
+    if cancel_event is None:
+        cancel_event = _burst_cancel_event
+    if cancel_event is not None:
+        job._cancel_event = cancel_event
+    job.metrics = JobMetrics(file_path)
+    job.metrics.log_path = None  # part metrics are added to the burst job and are not written to the log
+    job._run()
+    return (file_path, job.metrics.stage_times, job.metrics.pages)
+
+
+class BurstPdfJob(ProcessorJob):
+    # pages of the plan are split to many files by split_page_plan(), files are written in parallel worker processes
+    # file_path is the name pattern: statement.pdf -> statement_001.pdf, statement_002_Bookmark title.pdf, ...
+    def __init__(self, file_path, page_plan, split_rule, split_value=None, workers=1):
+        super(BurstPdfJob, self).__init__(file_path)
+        self.page_plan = PagePlan.from_data(page_plan)
+        self.split_rule = split_rule
+        self.split_value = split_value
+        self.workers = workers
+        self.total_pages = len(self.page_plan)  # until the split, parts can repeat pages (ranges) or leave them out
+        self.output_paths = []  # files written by the last run
+        self._workers_cancel_event = None  # event of the worker processes while they run
+
+    def get_output_path(self, index, count, label=None):
+        root, extension = os.path.splitext(self.file_path)
+        path = root + "_" + str(index + 1).zfill(max(3, len(str(count))))
+        if label is not None:
+            label = re.sub(r"[^\w\- ]+", "", label).strip()[:MAX_LABEL_LENGTH].strip()
+            if len(label) > 0:
+                path += "_" + label
+        return path + (extension if len(extension) > 0 else ".pdf")
+
+    def get_output_size(self):
+        return sum(os.path.getsize(p) for p in self.output_paths)
+
+    def cancel(self):  # workers stop before their next page
+        super(BurstPdfJob, self).cancel()
+        workers_cancel_event = self._workers_cancel_event
+        if workers_cancel_event is not None:
+            workers_cancel_event.set()
+
+    def _part_done(self, result, pages_done):  # return the number of pages done with this part
+        file_path, stage_times, pages = result
+        self.output_paths.append(file_path)
+        self.metrics.add_times(dict((stage, seconds) for stage, seconds in stage_times.items() if seconds > 0))
+        self._step(pages_done + pages, self.total_pages, pages)
+        return pages_done + pages
+
+    def _run(self):
+        with self.metrics.stage("open"):
+            parts = split_page_plan(self.page_plan, self.split_rule, self.split_value)
+        self.total_pages = sum(len(plan) for label, plan in parts)
+        tasks = [(self.get_output_path(i, len(parts), label), plan.to_data()) for i, (label, plan) in enumerate(parts)]
+        self.metrics.bytes_read = sum(os.path.getsize(p) for p in self.page_plan.sources)
+        self.output_paths = []
+        self._message("Split " + str(self.total_pages) + " pages to " + str(len(tasks)) + " files")
+        workers = min(self.workers, len(tasks), max(1, self.total_pages // BURST_PAGES_PER_WORKER))
+        pages_done = 0
+        try:
+            if workers > 1 and current_process().daemon is False:
+                # neighbouring parts usually have the same sources, chunks of them go to one process and use its parsed readers
+                chunk_size = max(1, len(tasks) // (workers * 4))
+                context = get_context("spawn")
+                self._workers_cancel_event = context.Event()  # given to the workers at their start, it can not be sent with the tasks
+                if self.is_cancelled():
+                    self._workers_cancel_event.set()
+                try:
+                    with context.Pool(workers, _init_burst_worker, (self._workers_cancel_event,)) as pool:
+                        for result in pool.imap_unordered(_write_burst_part, tasks, chunk_size):
+                            pages_done = self._part_done(result, pages_done)
+                finally:
+                    self._workers_cancel_event = None
+            else:
+                for task in tasks:
+                    pages_done = self._part_done(_write_burst_part(task, self._cancel_event), pages_done)
+        except BaseException:
+            # finished files are complete documents and are kept, files and temporary files of the stopped workers are removed
+            written = set(self.output_paths)
+            for file_path, plan_data in tasks:
+                if file_path not in written:
+                    for path in [file_path] + glob(escape(file_path) + ".*.tmp"):
+                        if os.path.exists(path):
+                            os.remove(path)
+            raise
+        self._message("Save " + str(len(self.output_paths)) + " files to " + os.path.dirname(os.path.abspath(self.file_path)))
+
+    def to_data(self):
+        return {"type": "burst", "output": self.file_path, "pages": self.page_plan.to_data(), "split": self.split_rule, "split_value": self.split_value, "workers": self.workers}
+
+
+def job_from_data(data):  # data is a dictionary in the form returned by to_data() method of the job
+    job_type = data.get("type")
+    if job_type == "images":
+        img_params = get_default_image_parameters(data.get("parameters", {}).get("mode", 0))
+        img_params.update(data.get("parameters", {}))
+        img_params["background"] = tuple(img_params["background"])
+        return ImagesToPdfJob(data["output"], data["images"], img_params)
+    elif job_type == "pages":
+        return PagesToPdfJob(data["output"], data["pages"], data.get("streaming", True), data.get("checkpoint", False), data.get("append", False))
+    elif job_type == "burst":
+        return BurstPdfJob(data["output"], data["pages"], data["split"], data.get("split_value"), data.get("workers", 1))
+    else:
+        raise ValueError("Unsupported job type " + str(job_type))
+
+
+def run_job(data, step_callback=None, message_callback=None):
+    job = job_from_data(data)
+    dir_path = os.path.dirname(os.path.abspath(job.file_path))
+    if os.path.exists(dir_path) is False:
+        os.makedirs(dir_path)
+    job.run(step_callback, message_callback)
+    return job.file_path
@@ -1,18 +1,277 @@
 import os
-from PySide2.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QPushButton, QLabel, QHBoxLayout, QListWidgetItem, QLineEdit
-from PySide2.QtGui import QColor
-from PySide2.QtCore import Qt
+from array import array
+from itertools import compress
+from PySide2.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QPushButton, QLabel, QHBoxLayout, QLineEdit, QComboBox, QListView, QAbstractItemView, QSlider, QListWidget, QListWidgetItem
+from PySide2.QtGui import QColor, QPixmap
+from PySide2.QtCore import Qt, QSize, QAbstractListModel, QModelIndex, QItemSelection, QItemSelectionModel
 from qt_parameters import ParameterInteger, ParameterColor, ParameterCombobox
-from qt_threads import CreatePdfThread, CreatePdfPagesThread
+from qt_threads import JobScheduler, PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH, JOB_DONE, JOB_CANCELLED
+from processor_engine import ImagesToPdfJob, PagesToPdfJob, BurstPdfJob, parse_split_ranges
+from thumbnail_cache import LruCache, get_size_bucket, get_source_key
+from pdf_render import is_render_available
 
 
-class ImageListItem(QListWidgetItem):
-    def __init__(self, *args):
-        super(ImageListItem, self).__init__(args[0])
-        self.id = args[1]
+class EntryListModel(QAbstractListModel):
+    # list of (source, page) entries in two arrays, page is -1 for entries which are whole files (images)
+    def __init__(self, text_function, decoration_function=None):
+        super(EntryListModel, self).__init__()
+        self.text_function = text_function  # (source path, page) -> display text, called only for visible rows
+        self.decoration_function = decoration_function  # (source path, page) -> QPixmap or None
+        self.sources = []
+        self._source_ids = {}
+        self.entry_sources = array("i")
+        self.entry_pages = array("i")
 
-    def get_data(self):
-        return self.id
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entry_sources)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid():
+            if role == Qt.DisplayRole:
+                return self.get_text(index.row())
+            elif role == Qt.DecorationRole and self.decoration_function is not None:
+                row = index.row()
+                return self.decoration_function(self.sources[self.entry_sources[row]], self.entry_pages[row])
+        return None
+
+    def get_source_id(self, source_path):
+        source_id = self._source_ids.get(source_path)
+        if source_id is None:
+            source_id = len(self.sources)
+            self.sources.append(source_path)
+            self._source_ids[source_path] = source_id
+        return source_id
+
+    def add_entries(self, source_path, pages):  # pages is a range or a list of page indexes, [-1] for a file entry
+        pages = array("i", pages)
+        if len(pages) == 0:
+            return
+        source_id = self.get_source_id(source_path)
+        first = len(self.entry_sources)
+        self.beginInsertRows(QModelIndex(), first, first + len(pages) - 1)
+        self.entry_sources.extend(array("i", [source_id]) * len(pages))
+        self.entry_pages.extend(pages)
+        self.endInsertRows()
+
+    def add_files(self, paths):  # add one file entry for every path
+        if len(paths) == 0:
+            return
+        first = len(self.entry_sources)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        self.entry_sources.extend(array("i", [self.get_source_id(p) for p in paths]))
+        self.entry_pages.extend(array("i", [-1]) * len(paths))
+        self.endInsertRows()
+
+    def get_data(self, row):  # path for file entries, (path, page) for pages
+        source_path = self.sources[self.entry_sources[row]]
+        page = self.entry_pages[row]
+        return source_path if page < 0 else (source_path, page)
+
+    def get_text(self, row):
+        return self.text_function(self.sources[self.entry_sources[row]], self.entry_pages[row])
+
+    def swap_rows(self, rows, delta):  # swap every row with the row + delta in the given order
+        for row in rows:
+            other = row + delta
+            self.entry_sources[row], self.entry_sources[other] = self.entry_sources[other], self.entry_sources[row]
+            self.entry_pages[row], self.entry_pages[other] = self.entry_pages[other], self.entry_pages[row]
+        if len(rows) > 0:
+            top = min(rows[0], rows[-1]) + min(0, delta)
+            bottom = max(rows[0], rows[-1]) + max(0, delta)
+            self.dataChanged.emit(self.index(top), self.index(bottom), [Qt.DisplayRole])
+
+    def remove_rows(self, rows):
+        keep = bytearray(b"\x01") * len(self.entry_sources)
+        for row in rows:
+            keep[row] = 0
+        self.beginResetModel()
+        self.entry_sources = array("i", compress(self.entry_sources, keep))
+        self.entry_pages = array("i", compress(self.entry_pages, keep))
+        self.endResetModel()
+
+
+class EntryListView(QListView):
+    def __init__(self, model):
+        super(EntryListView, self).__init__()
+        self.setModel(model)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setAlternatingRowColors(True)
+        self.setUniformItemSizes(True)  # allows to skip measuring of every row
+
+    def count(self):
+        return self.model().rowCount()
+
+    def get_selected_ranges(self):  # sorted list of (top, bottom) rows, bottom is included
+        ranges = [(r.top(), r.bottom()) for r in self.selectionModel().selection()]
+        ranges.sort()
+        return ranges
+
+    def get_selected_rows(self):  # sorted list of selected rows
+        rows = []
+        last = -1
+        is_overlapped = False
+        for top, bottom in self.get_selected_ranges():
+            if top <= last:
+                is_overlapped = True
+            last = max(last, bottom)
+            rows.extend(range(top, bottom + 1))
+        return sorted(set(rows)) if is_overlapped else rows
+
+    def has_selection(self):
+        return self.selectionModel().hasSelection()
+
+    def select_ranges(self, ranges):  # ranges is a list of (top, bottom) rows, bottom is included
+        selection = QItemSelection()
+        model = self.model()
+        for top, bottom in ranges:
+            selection.select(model.index(top), model.index(bottom))
+        # ClearAndSelect and Toggle compare old and new ranges one by one, it is very slow for thousands of ranges
+        self.selectionModel().clearSelection()
+        self.selectionModel().select(selection, QItemSelectionModel.Select)
+
+    def select_rows(self, rows):  # rows should be sorted, they are merged to ranges
+        ranges = []
+        start = None
+        previous = None
+        for row in rows:
+            if start is None:
+                start = row
+            elif row != previous + 1:
+                ranges.append((start, previous))
+                start = row
+            previous = row
+        if start is not None:
+            ranges.append((start, previous))
+        self.select_ranges(ranges)
+
+    def move_selected(self, delta):  # delta is -1 or 1, return the number of moved rows
+        rows = self.get_selected_rows()
+        if len(rows) == 0 or (delta < 0 and rows[0] == 0) or (delta > 0 and rows[-1] == self.count() - 1):
+            return 0
+        self.model().swap_rows(rows if delta < 0 else rows[::-1], delta)
+        self.select_rows([r + delta for r in rows])
+        return len(rows)
+
+    def invert_selection(self):  # return the number of selected rows after inverting
+        count = self.count()
+        rows = self.get_selected_rows()
+        ranges = []
+        start = 0
+        for row in rows:
+            if row > start:
+                ranges.append((start, row - 1))
+            start = row + 1
+        if start < count:
+            ranges.append((start, count - 1))
+        self.select_ranges(ranges)
+        return count - len(rows)
+
+    def delete_selected(self, max_names=10):  # return (number of deleted rows, texts of the first deleted rows)
+        rows = self.get_selected_rows()
+        names = [self.model().get_text(r) for r in rows[:max_names]]
+        if len(rows) > 0:
+            self.model().remove_rows(rows)
+        return (len(rows), names)
+
+
+class PreviewWidget(QWidget):
+    # preview of an image or a pdf page with the scale slider, pixmaps are made in background by ThumbnailPrefetcher
+    def __init__(self, prefetcher, status_bar=None, select_text="Click item to preview", width=256):
+        super(PreviewWidget, self).__init__()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 4, 0)
+        self.status_bar = status_bar
+        self.IMG_PREVIEW_WIDTH = width
+        self.select_text = select_text
+        self.source = None  # image path or (pdf path, page index)
+        self.last_preview_pixmap = None
+        self.pixmap_cache = LruCache(max_items=64)  # ("preview", source key, size bucket) -> QPixmap
+        self.prefetcher = prefetcher
+        self.prefetcher.thumbnail_signal.connect(self.thumbnail_ready_signal)
+        self.img_label = QLabel()
+        self.img_label.setAlignment(Qt.AlignCenter)
+        self.img_label.setText(self.select_text)
+        layout.addWidget(self.img_label)
+        # slider for the preview scale
+        self.img_scale_slider = QSlider()
+        self.img_scale_slider.setMinimum(6)
+        self.img_scale_slider.setMaximum(2048)
+        self.img_scale_slider.setValue(self.IMG_PREVIEW_WIDTH)
+        self.img_scale_slider.setOrientation(Qt.Horizontal)
+        self.img_scale_slider.valueChanged.connect(self.change_scale_slider_signal)
+        layout.addWidget(self.img_scale_slider)
+        self.setLayout(layout)
+        self.update_preview()
+
+    def _get_source_name(self, source):
+        if isinstance(source, tuple):
+            return "page " + str(source[1] + 1) + " (" + os.path.basename(source[0]) + ")"
+        return os.path.basename(source)
+
+    def get_key(self, source, size):
+        try:
+            return ("preview", get_source_key(source), get_size_bucket(size))
+        except OSError:  # the file was deleted
+            return None
+
+    def _set_error_text(self):
+        if isinstance(self.source, tuple) and is_render_available() is False:
+            self.img_label.setText("Install PyMuPDF to preview pdf pages")
+        else:
+            self.img_label.setText("Can not open " + self._get_source_name(self.source))
+
+    def update_preview(self):
+        self.img_label.setMinimumWidth(self.IMG_PREVIEW_WIDTH)
+        self.img_label.setMaximumWidth(max(self.IMG_PREVIEW_WIDTH, self.img_scale_slider.width()))
+        if self.source is not None:
+            key = self.get_key(self.source, self.IMG_PREVIEW_WIDTH)
+            if key is None:
+                self._set_error_text()
+                return
+            img_pix = self.pixmap_cache.get(key)
+            if img_pix is None:
+                self.prefetcher.request(key, self.source, self.IMG_PREVIEW_WIDTH, priority=2)
+                if self.last_preview_pixmap is None:
+                    self.img_label.setText("Loading...")
+                    return
+                img_pix = self.last_preview_pixmap  # show the pixmap of the other size while the new one is decoded
+            else:
+                self.last_preview_pixmap = img_pix
+            img_pix = img_pix.scaled(QSize(self.IMG_PREVIEW_WIDTH, self.IMG_PREVIEW_WIDTH), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.img_label.setPixmap(img_pix)
+
+    def set_source(self, source):
+        if source is None:
+            self.source = None
+            self.img_label.setText(self.select_text)
+        elif source != self.source:
+            self.source = source
+            self.last_preview_pixmap = None
+            self.update_preview()
+
+    def prefetch(self, sources, group, priority):
+        for source in sources:
+            key = self.get_key(source, self.IMG_PREVIEW_WIDTH)
+            if key is not None and self.pixmap_cache.get(key) is None:
+                self.prefetcher.request(key, source, self.IMG_PREVIEW_WIDTH, group=group, priority=priority)
+
+    def thumbnail_ready_signal(self, key, qimage):
+        if key[0] != "preview":
+            return
+        is_current = self.source is not None and key == self.get_key(self.source, self.IMG_PREVIEW_WIDTH)
+        if qimage is None:
+            if is_current:
+                self._set_error_text()
+            return
+        self.pixmap_cache.put(key, QPixmap.fromImage(qimage))
+        if is_current:
+            self.update_preview()
+
+    def change_scale_slider_signal(self, value):
+        self.IMG_PREVIEW_WIDTH = value
+        self.update_preview()
+        if self.status_bar is not None:
+            self.status_bar.showMessage("Set preview scale to " + str(value))
 
 
 class OptionsFromSourceWidget(QWidget):
@@ -146,21 +405,164 @@ class SelectWidget(QGroupBox):
         self.setLayout(select_zone_layout)
 
 
+class LazyWidget(QWidget):
+    # placeholder which creates the real widget when it is shown or requested for the first time
+    def __init__(self, create_function):
+        super(LazyWidget, self).__init__()
+        self.create_function = create_function
+        self.widget = None
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+    def get_widget(self):
+        if self.widget is None:
+            self.widget = self.create_function()
+            self.layout().addWidget(self.widget)
+        return self.widget
+
+    def showEvent(self, event):
+        self.get_widget()
+        super(LazyWidget, self).showEvent(event)
+
+
+def format_eta(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return str(seconds // 3600) + ":" + str(seconds // 60 % 60).zfill(2) + ":" + str(seconds % 60).zfill(2)
+    return str(seconds // 60) + ":" + str(seconds % 60).zfill(2)
+
+
+class JobQueueWidget(QWidget):
+    # list of the queued, running and finished jobs of the scheduler
+    def __init__(self, scheduler, label_width=80, status_bar=None):
+        super(JobQueueWidget, self).__init__()
+        self.scheduler = scheduler
+        self.status_bar = status_bar
+        self.job_items = {}  # job id -> QListWidgetItem
+        self.jobs = {}  # job id -> job, finished jobs are kept for their metrics until they are cleared
+        self.finished_jobs = set()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.jobs_list = QListWidget()
+        self.jobs_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.jobs_list.setMaximumHeight(96)
+        controls_layout = QHBoxLayout()
+        concurrency_param = ParameterInteger(self, value=scheduler.concurrency, max_visible=os.cpu_count() or 8, min_value=1, name="concurrency", label_text="Parallel jobs", label_width=label_width, change_callback=self.change_concurrency_callback)
+        cancel_button = QPushButton("Cancel Selected")
+        cancel_button.clicked.connect(self.click_cancel)
+        clear_button = QPushButton("Clear Finished")
+        clear_button.clicked.connect(self.click_clear)
+        controls_layout.addWidget(concurrency_param)
+        controls_layout.addWidget(cancel_button)
+        controls_layout.addWidget(clear_button)
+        layout.addWidget(self.jobs_list)
+        layout.addLayout(controls_layout)
+        self.setLayout(layout)
+
+        scheduler.added_signal.connect(self.job_added_signal)
+        scheduler.started_signal.connect(self.job_started_signal)
+        scheduler.progress_signal.connect(self.job_progress_signal)
+        scheduler.finished_signal.connect(self.job_finished_signal)
+
+    def _set_job_text(self, job_id, text):
+        item = self.job_items.get(job_id)
+        if item is not None:
+            item.setText(os.path.basename(item.data(Qt.UserRole)) + " - " + text)
+
+    def job_added_signal(self, job_id, job):
+        item = QListWidgetItem()
+        item.setData(Qt.UserRole, job.file_path)
+        item.setData(Qt.UserRole + 1, job_id)
+        self.job_items[job_id] = item
+        self.jobs[job_id] = job
+        self.jobs_list.addItem(item)
+        self._set_job_text(job_id, "queued")
+
+    def job_started_signal(self, job_id):
+        self._set_job_text(job_id, "started")
+
+    def job_progress_signal(self, job_id, current, total, eta):
+        self._set_job_text(job_id, str(current) + " of " + str(total) + ("" if eta is None else ", " + format_eta(eta) + " left"))
+
+    def job_finished_signal(self, job_id, state, error):
+        self.finished_jobs.add(job_id)
+        metrics = self.jobs[job_id].metrics
+        if state == JOB_DONE and metrics is not None:
+            self._set_job_text(job_id, state + ", " + metrics.get_summary())
+            self.job_items[job_id].setToolTip(metrics.get_details())
+        else:
+            self._set_job_text(job_id, state if error is None else state + ": " + error)
+
+    def change_concurrency_callback(self, param_name="", param_value=None):
+        self.scheduler.set_concurrency(param_value)
+        if self.status_bar is not None:
+            self.status_bar.showMessage("Set number of parallel jobs to " + str(param_value))
+
+    def click_cancel(self):
+        cancelled = 0
+        for item in self.jobs_list.selectedItems():
+            if self.scheduler.cancel(item.data(Qt.UserRole + 1)):
+                cancelled += 1
+        if self.status_bar is not None:
+            self.status_bar.showMessage("Cancel " + str(cancelled) + " jobs" if cancelled > 0 else "Nothing to cancel")
+
+    def click_clear(self):
+        for job_id in self.finished_jobs:
+            item = self.job_items.pop(job_id)
+            self.jobs.pop(job_id)
+            self.jobs_list.takeItem(self.jobs_list.row(item))
+        self.finished_jobs = set()
+
+
 class CreatePdfWidget(QWidget):
     def __init__(self, get_data, status_link):
         super(CreatePdfWidget, self).__init__()
         self.get_data_method = get_data
         self.status_bar = status_link
-        layout = QHBoxLayout()
+        self.scheduler = JobScheduler()
+        self.scheduler.progress_signal.connect(self.update_step_callback)
+        self.scheduler.message_signal.connect(self.message_callback)
+        self.scheduler.finished_signal.connect(self.finish_callback)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        create_layout = QHBoxLayout()
         path_label = QLabel("Path: ")
         path_to_save = os.path.split(os.path.realpath(__file__))[0] + "\\selection.pdf"
         self.path_line_edit = QLineEdit(path_to_save)
+        self.output_combobox = QComboBox()
+        self.output_combobox.addItem("In Memory")
+        self.output_combobox.addItem("Streaming")
+        self.output_combobox.addItem("Resumable")
+        self.output_combobox.addItem("Append")
+        self.output_combobox.setCurrentIndex(1)  # streaming copies pages from the shared parsed sources and stores repeated resources once
+        self.output_combobox.setToolTip("Streaming mode writes every page to the file as soon as it is ready\nResumable mode also saves the progress, so a cancelled or crashed job continues from the last saved page\nAppend mode adds pages to the end of the existing file without rewriting it")
+        # pages of the synth tab can be split to many files, the value is the number of pages or the page ranges
+        self.split_combobox = QComboBox()
+        for name in ("One File", "Split Every N Pages", "Split By Source File", "Split By Bookmarks", "Split By Page Ranges"):
+            self.split_combobox.addItem(name)
+        self.split_combobox.setToolTip("Split the pages of the Synth Pdf tab to many files: path.pdf -> path_001.pdf, path_002.pdf, ...\nFiles are written in parallel processes")
+        self.split_combobox.currentIndexChanged.connect(self.change_split_signal)
+        self.split_line_edit = QLineEdit()
+        self.split_line_edit.setMaximumWidth(160)
+        self.split_line_edit.setVisible(False)
+        self.priority_combobox = QComboBox()
+        for name in ("Low Priority", "Normal Priority", "High Priority"):
+            self.priority_combobox.addItem(name)
+        self.priority_combobox.setCurrentIndex(1)
         save_button = QPushButton("Create Pdf")
         save_button.setMinimumHeight(28)
         save_button.clicked.connect(self.click_create_pdf)
-        layout.addWidget(path_label)
-        layout.addWidget(self.path_line_edit)
-        layout.addWidget(save_button)
+        create_layout.addWidget(path_label)
+        create_layout.addWidget(self.path_line_edit)
+        create_layout.addWidget(self.output_combobox)
+        create_layout.addWidget(self.split_combobox)
+        create_layout.addWidget(self.split_line_edit)
+        create_layout.addWidget(self.priority_combobox)
+        create_layout.addWidget(save_button)
+        self.job_queue_widget = JobQueueWidget(self.scheduler, status_bar=self.status_bar)
+        layout.addLayout(create_layout)
+        layout.addWidget(self.job_queue_widget)
         self.setLayout(layout)
 
     def click_create_pdf(self):
@@ -178,30 +580,70 @@ class CreatePdfWidget(QWidget):
                 image_params = data[2]  # {'mode': 0, 'pixels': 10, 'margin': 0} or {'mode': 1, 'align': 0, 'margin': 0}
                 self._create_pdf_from_images(path_to_save, files, image_params)
             elif data[0] == 1:  # create pdf from pages of the other pdfs
-                pages_dict = data[1]
-                self._create_pdf_from_pages(path_to_save, pages_dict)
+                page_plan = data[1]
+                self._create_pdf_from_pages(path_to_save, page_plan)
             else:
                 print("Unsupported mode " + str(data[0]))
 
-    def update_step_callback(self, callback_data):  # data in the form (current step, total steps)
-        self.status_bar.showMessage("Create " + str(callback_data[0]) + " page from " + str(callback_data[1]) + " total pages")
+    def change_split_signal(self, index):
+        self.split_line_edit.setVisible(index == 1 or index == 4)
+        if index == 1:
+            self.split_line_edit.setPlaceholderText("pages in every file")
+        elif index == 4:
+            self.split_line_edit.setPlaceholderText("1-100, 101-250, 251-")
+
+    def get_split(self):  # return (split rule, split value), rule is None for one file
+        index = self.split_combobox.currentIndex()
+        rule = (None, "pages", "sources", "bookmarks", "ranges")[index]
+        if rule == "pages":
+            text = self.split_line_edit.text().strip()
+            if text.isdigit() is False or int(text) == 0:
+                raise ValueError("Wrong number of pages " + text)
+            return (rule, int(text))
+        elif rule == "ranges":
+            return (rule, self.split_line_edit.text())
+        return (rule, None)
 
-    def finish_callback(self):
-        self.status_bar.showMessage("Done!")
+    def update_step_callback(self, job_id, current, total, eta):
+        self.status_bar.showMessage("Create " + str(current) + " page from " + str(total) + " total pages" + ("" if eta is None else ", " + format_eta(eta) + " left"))
 
-    def message_callback(self, message):
+    def finish_callback(self, job_id, state, error):
+        if state == JOB_DONE:
+            self.status_bar.showMessage("Done!" if self.scheduler.queued_count() + self.scheduler.running_count() == 0 else "Done, " + str(self.scheduler.queued_count()) + " jobs in the queue")
+        elif state != JOB_CANCELLED:
+            self.status_bar.showMessage("Job failed: " + str(error))
+
+    def message_callback(self, job_id, message):
         self.status_bar.showMessage(message)
 
+    def is_streaming(self):
+        return self.output_combobox.currentIndex() >= 1
+
+    def is_checkpoint(self):
+        return self.output_combobox.currentIndex() == 2
+
+    def is_append(self):
+        return self.output_combobox.currentIndex() == 3
+
+    def get_priority(self):
+        return (PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH)[self.priority_combobox.currentIndex()]
+
     def _create_pdf_from_images(self, path_to_save, path_array, img_params):
-        self.create_thread = CreatePdfThread(path_to_save, (path_array, img_params))
-        self.create_thread.step_signal.connect(self.update_step_callback)
-        self.create_thread.finished.connect(self.finish_callback)
-        self.create_thread.message_signal.connect(self.message_callback)
-        self.create_thread.start()
-
-    def _create_pdf_from_pages(self, path_to_save, pages_dict):
-        self.create_thread = CreatePdfPagesThread(path_to_save, pages_dict)
-        self.create_thread.step_signal.connect(self.update_step_callback)
-        self.create_thread.finished.connect(self.finish_callback)
-        self.create_thread.message_signal.connect(self.message_callback)
-        self.create_thread.start()
+        img_params = dict(img_params)
+        img_params["streaming"] = self.is_streaming()
+        img_params["checkpoint"] = self.is_checkpoint()
+        img_params["append"] = self.is_append()
+        self.scheduler.add(ImagesToPdfJob(path_to_save, path_array, img_params), self.get_priority())
+
+    def _create_pdf_from_pages(self, path_to_save, page_plan):
+        try:
+            split_rule, split_value = self.get_split()
+            if split_rule == "ranges" and len(parse_split_ranges(split_value, len(page_plan))) == 0:
+                raise ValueError("No pages in the ranges " + split_value)
+        except ValueError as e:
+            self.status_bar.showMessage(str(e))
+            return
+        if split_rule is not None:
+            self.scheduler.add(BurstPdfJob(path_to_save, page_plan, split_rule, split_value, os.cpu_count() or 1), self.get_priority())
+            return
+        self.scheduler.add(PagesToPdfJob(path_to_save, page_plan, self.is_streaming(), self.is_checkpoint(), self.is_append()), self.get_priority())
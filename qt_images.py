@@ -0,0 +1,19 @@
+from PySide2.QtGui import QImage
+
+# pillow modes which have the same memory layout as some QImage format
+QIMAGE_FORMATS = {"RGB": (QImage.Format_RGB888, 3),
+                  "RGBA": (QImage.Format_RGBA8888, 4),
+                  "L": (QImage.Format_Grayscale8, 1)}
+
+
+def pillow_to_qimage(img):  # return QImage which uses pillow pixels without any channel swapping or conversions
+    if img.mode not in QIMAGE_FORMATS:
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+    qformat, channels = QIMAGE_FORMATS[img.mode]
+    width, height = img.size
+    # tobytes() is the only copy, rows are not aligned to 4 bytes, so pass the stride explicitly
+    data = img.tobytes("raw", img.mode)
+    qimage = QImage(data, width, height, width * channels, qformat)
+    # QImage does not own the buffer, keep it alive with the image, so it can be sent between threads
+    qimage.pillow_data = data
+    return qimage
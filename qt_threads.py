@@ -1,122 +1,251 @@
-from PySide2.QtCore import QThread, Signal
-from PyPDF2 import PdfFileReader, PdfFileWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4, A5, A6
-from PIL import Image
+import os
+import time
+import heapq
+import threading
+from PySide2.QtCore import Signal, QObject, QRunnable, QThreadPool, QTimer
+from qt_images import pillow_to_qimage
+from processor_engine import JobCancelled
 
+PRIORITY_LOW = -1
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 1
 
-class CreatePdfPagesThread(QThread):
-    step_signal = Signal(object)
-    message_signal = Signal(object)
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
 
-    def __init__(self, file_path, pages_dict):
-        super(CreatePdfPagesThread, self).__init__()
-        self.file_path = file_path
-        self.pages_dict = pages_dict
-        self.total_pages = 0
-        for f, p_array in self.pages_dict.items():
-            self.total_pages += len(p_array)
+
+class JobTask(QRunnable):
+    def __init__(self, scheduler, job_id, job):
+        super(JobTask, self).__init__()
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.job = job
+        self.start_time = None
+
+    def step_callback(self, callback_data):  # data in the form (current step, total steps)
+        current, total = callback_data
+        elapsed = time.monotonic() - self.start_time
+        eta = elapsed / current * (total - current) if current > 0 else None
+        self.scheduler.progress_signal.emit(self.job_id, current, total, eta)
+
+    def message_callback(self, message):
+        self.scheduler.message_signal.emit(self.job_id, message)
 
     def run(self):
-        writer = PdfFileWriter()
-        iterator = 0
-        for pdf_path, pages_array in self.pages_dict.items():
-            file = open(pdf_path, "rb")
-            pdf = PdfFileReader(file)
-            for p in pages_array:
-                self.step_signal.emit((iterator + 1, self.total_pages))
-                writer.addPage(pdf.getPage(p))
-        with open(self.file_path, "wb") as output_stream:
-            self.message_signal.emit("Save file " + self.file_path)
-            writer.write(output_stream)
-
-
-class CreatePdfThread(QThread):
-    step_signal = Signal(object)
-    message_signal = Signal(object)
-
-    def __init__(self, file_path, data):
-        QThread.__init__(self)
-        self.file_path = file_path
-        self.img_data = data
+        self.start_time = time.monotonic()
+        self.scheduler.started_signal.emit(self.job_id)
+        try:
+            self.job.run(self.step_callback, self.message_callback)
+        except JobCancelled:
+            self.scheduler.finished_signal.emit(self.job_id, JOB_CANCELLED, None)
+            return
+        except Exception as e:
+            self.scheduler.finished_signal.emit(self.job_id, JOB_FAILED, str(e))
+            return
+        self.scheduler.finished_signal.emit(self.job_id, JOB_DONE, None)
+
+
+class JobScheduler(QObject):
+    # jobs wait in the queue ordered by priority (then by the adding order), at most concurrency jobs run at once
+    # a job with the output file of a running job waits until that job is finished, even if it has higher priority
+    # all the queue state is changed only in the thread of the scheduler, workers just emit signals
+    added_signal = Signal(object, object)  # (job id, job)
+    started_signal = Signal(object)  # job id
+    progress_signal = Signal(object, object, object, object)  # (job id, current step, total steps, seconds left or None)
+    message_signal = Signal(object, object)  # (job id, message)
+    finished_signal = Signal(object, object, object)  # (job id, JOB_DONE, JOB_FAILED or JOB_CANCELLED, error message or None)
+
+    def __init__(self, concurrency=1):
+        super(JobScheduler, self).__init__()
+        self.concurrency = max(1, concurrency)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(self.concurrency)
+        self._queue = []  # heap of (-priority, job id), ids grow, so jobs of the same priority run in the adding order
+        self._jobs = {}  # job id -> job, for queued and running jobs
+        self._running = set()
+        self._output_paths = {}  # running job id -> normalized output path
+        self._last_id = 0
+        self.finished_signal.connect(self._job_finished)
+
+    def add(self, job, priority=PRIORITY_NORMAL):  # return id of the job
+        self._last_id += 1
+        job_id = self._last_id
+        self._jobs[job_id] = job
+        heapq.heappush(self._queue, (-priority, job_id))
+        self.added_signal.emit(job_id, job)
+        self._dispatch()
+        return job_id
+
+    def get_job(self, job_id):
+        return self._jobs.get(job_id)
+
+    def is_queued(self, job_id):
+        return job_id in self._jobs and job_id not in self._running
+
+    def is_running(self, job_id):
+        return job_id in self._running
+
+    def queued_count(self):
+        return len(self._queue)
+
+    def running_count(self):
+        return len(self._running)
+
+    def set_concurrency(self, concurrency):
+        self.concurrency = max(1, concurrency)
+        # running jobs are not stopped when the concurrency decreases, new jobs wait until they finish
+        self.pool.setMaxThreadCount(max(self.concurrency, self.pool.maxThreadCount()))
+        self._dispatch()
+
+    def cancel(self, job_id):  # return False if the job is already finished
+        if job_id in self._running:
+            self._jobs[job_id].cancel()  # the job stops before the next page and emits finished_signal
+            return True
+        if job_id not in self._jobs:
+            return False
+        self._queue = [q for q in self._queue if q[1] != job_id]
+        heapq.heapify(self._queue)
+        self.finished_signal.emit(job_id, JOB_CANCELLED, None)
+        return True
+
+    def _dispatch(self):
+        held = []  # jobs which write to the output file of a running job, they go back to the queue
+        while len(self._queue) > 0 and len(self._running) < self.concurrency:
+            item = heapq.heappop(self._queue)
+            job_id = item[1]
+            output_path = os.path.normcase(os.path.abspath(self._jobs[job_id].file_path))
+            if output_path in self._output_paths.values():
+                held.append(item)
+                continue
+            self._running.add(job_id)
+            self._output_paths[job_id] = output_path
+            self.pool.start(JobTask(self, job_id, self._jobs[job_id]))
+        for item in held:
+            heapq.heappush(self._queue, item)
+
+    def _job_finished(self, job_id, state, error):
+        self._jobs.pop(job_id, None)
+        self._running.discard(job_id)
+        self._output_paths.pop(job_id, None)
+        self._dispatch()
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, prefetcher, key, source, size, group, generation):
+        super(ThumbnailTask, self).__init__()
+        self.prefetcher = prefetcher
+        self.key = key
+        self.source = source  # image path or (pdf path, page index)
+        self.size = size
+        self.group = group
+        self.generation = generation
 
     def run(self):
-        mode = self.img_data[1]["mode"]
-        canv = canvas.Canvas(self.file_path)
-        pages = len(self.img_data[0])
-        for i in range(pages):
-            self.step_signal.emit((i + 1, pages))
-            img_path = self.img_data[0][i]
-            width = None
-            height = None
-            with Image.open(img_path) as img:
-                size = img.size
-                width = size[0]
-                height = size[1]
-            margin = self.img_data[1]["margin"]
-            background = self.img_data[1]["background"]
-            if mode == 0:
-                pixels = self.img_data[1]["pixels"]
-                page_width = width + 2 * margin
-                page_height = height + 2 * margin
-                canv.setPageSize((page_width / pixels, page_height / pixels))
-                if margin > 0:
-                    canv.setFillColorRGB(background[0] / 255, background[1] / 255, background[2] / 255)
-                    canv.rect(0, 0, page_width, page_height, stroke=0, fill=1)
-                canv.drawImage(img_path, margin / pixels, margin / pixels, width / pixels, height / pixels)
-            else:
-                img_prop = height / width
-                page_width = A4[0] if mode == 1 else (A5[0] if mode == 2 else (A6[0] if mode == 3 else letter[0]))
-                page_height = A4[1] if mode == 1 else (A5[1] if mode == 2 else (A6[1] if mode == 3 else letter[1]))
-                page_prop = page_height / page_width
-                img_width = page_width - 2*margin
-                img_height = page_height - 2*margin
-                if img_prop > page_prop:
-                    img_width = img_height / img_prop
-                else:
-                    img_height = img_width * img_prop
-                if mode == 1:  # A4
-                    canv.setPageSize(A4)
-                elif mode == 2:  # A5
-                    canv.setPageSize(A5)
-                elif mode == 3:  # A6
-                    canv.setPageSize(A6)
-                elif mode == 4:  # Letter
-                    canv.setPageSize(letter)
-                align = self.img_data[1]["align"]
-                x_shift = 0
-                y_shift = 0
-                if align == 0:  # center
-                    x_shift = (page_width - img_width) / 2
-                    y_shift = (page_height - img_height) / 2
-                elif align == 1:  # Top-Center
-                    x_shift = (page_width - img_width) / 2
-                    y_shift = page_height - img_height - margin
-                elif align == 2:  # Bottom-Center
-                    x_shift = (page_width - img_width) / 2
-                    y_shift = margin
-                elif align == 3:  # Left-Top
-                    x_shift = margin
-                    y_shift = page_height - img_height - margin
-                elif align == 4:  # Left-Center
-                    x_shift = margin
-                    y_shift = (page_height - img_height) / 2
-                elif align == 5:  # Left-Bottom
-                    x_shift = margin
-                    y_shift = margin
-                elif align == 6:  # Right-Top
-                    x_shift = page_width - img_width - margin
-                    y_shift = page_height - img_height - margin
-                elif align == 7:  # Right-Center
-                    x_shift = page_width - img_width - margin
-                    y_shift = (page_height - img_height) / 2
-                elif align == 8:  # Right-Bottom
-                    x_shift = page_width - img_width - margin
-                    y_shift = margin
-                if margin > 0:
-                    canv.setFillColorRGB(background[0] / 255, background[1] / 255, background[2] / 255)
-                    canv.rect(0, 0, page_width, page_height, stroke=0, fill=1)
-                canv.drawImage(img_path, x_shift, y_shift, img_width, img_height)
-            canv.showPage()
-        self.message_signal.emit("Save file " + self.file_path)
-        canv.save()
+        if self.prefetcher.is_actual(self.group, self.generation) is False:  # the task was cancelled while it waited in the queue
+            self.prefetcher.task_done(self.key)
+            return
+        try:
+            img = self.prefetcher.thumbnail_cache.get_thumbnail(self.source, self.size)
+            qimage = None if img is None else pillow_to_qimage(img)
+        except Exception:
+            qimage = None
+        self.prefetcher.thumbnail_signal.emit(self.key, qimage)
+
+
+class ThumbnailPrefetcher(QObject):
+    thumbnail_signal = Signal(object, object)  # (key, QImage or None if the image can not be opened), emitted from worker threads
+
+    def __init__(self, thumbnail_cache, workers=None):
+        super(ThumbnailPrefetcher, self).__init__()
+        self.thumbnail_cache = thumbnail_cache
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(workers if workers is not None else max(1, (os.cpu_count() or 2) - 1))
+        self._generations = {}  # group name -> generation, tasks of older generations are skipped
+        self._in_flight = {}  # key -> group
+        self._lock = threading.Lock()
+        self.thumbnail_signal.connect(self._thumbnail_done)
+
+    def is_actual(self, group, generation):
+        with self._lock:
+            return self._generations.get(group, 0) == generation
+
+    def task_done(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _thumbnail_done(self, key, qimage):
+        self.task_done(key)
+
+    def request(self, key, source, size, group="current", priority=0):  # return False if the same thumbnail is already in work
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight[key] = group
+            generation = self._generations.get(group, 0)
+        self.pool.start(ThumbnailTask(self, key, source, size, group, generation), priority)
+        return True
+
+    def cancel(self, group):
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            # cancelled tasks are still in the queue, allow to request the same thumbnails again
+            for key in [k for k, g in self._in_flight.items() if g == group]:
+                self._in_flight.pop(key)
+
+
+class ProbeTask(QRunnable):
+    def __init__(self, prober, index, path):
+        super(ProbeTask, self).__init__()
+        self.prober = prober
+        self.index = index
+        self.path = path
+
+    def run(self):
+        try:
+            result = self.prober.probe_function(self.path)
+        except Exception as e:
+            self.prober.task_done_signal.emit(self.index, self.path, None, str(e))
+            return
+        self.prober.task_done_signal.emit(self.index, self.path, result, None)
+
+
+class FileProber(QObject):
+    # added files are checked in the thread pool, results are emitted in batches in the order of the probe() calls
+    probed_signal = Signal(object)  # list of (path, probe result or None, error message or None)
+    task_done_signal = Signal(object, object, object, object)  # (index, path, result, error), emitted from worker threads
+
+    def __init__(self, probe_function, workers=None):
+        super(FileProber, self).__init__()
+        self.probe_function = probe_function  # path -> result, raise if the file can not be added
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(workers if workers is not None else max(4, os.cpu_count() or 4))  # the probes mostly wait for the disk
+        self._next_index = 0
+        self._emit_index = 0
+        self._results = {}  # index -> (path, result, error), results which wait for the previous ones
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(50)  # collect results for a while, so thousands of files do not insert rows one by one
+        self.flush_timer.timeout.connect(self._flush)
+        self.task_done_signal.connect(self._task_done)
+
+    def pending_count(self):
+        return self._next_index - self._emit_index
+
+    def probe(self, paths):
+        for path in paths:
+            self.pool.start(ProbeTask(self, self._next_index, path))
+            self._next_index += 1
+
+    def _task_done(self, index, path, result, error):
+        self._results[index] = (path, result, error)
+        if self.flush_timer.isActive() is False:
+            self.flush_timer.start()
+
+    def _flush(self):
+        batch = []
+        while self._emit_index in self._results:
+            batch.append(self._results.pop(self._emit_index))
+            self._emit_index += 1
+        if len(batch) > 0:
+            self.probed_signal.emit(batch)
@@ -0,0 +1,186 @@
+import os
+import mmap
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# parsed pdf readers are shared between listing pages in the gui and creating output files
+# readers are keyed by (path, modification time, size), so changed files are parsed again
+
+MAX_OPEN_FILES = 32
+USE_MMAP = True  # read source files through memory maps, so all readers of one file use the same pages of the os file cache
+# a mapped file must not be truncated or rewritten in place: reading a page of the map behind the new end of the file kills
+# the process with SIGBUS instead of raising an exception, an output file can be one of the sources of its own job,
+# so the jobs write to a temporary file and replace the output at the end, the append mode only adds bytes after the old end
+
+
+def get_file_key(pdf_path):
+    path = os.path.abspath(pdf_path)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def map_file(file):  # return read only memory map of the file, None if the file can not be mapped (empty or special files)
+    if USE_MMAP is False:
+        return None
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+class CachedReader(object):
+    def __init__(self, key):
+        from PyPDF2 import PdfFileReader  # PyPDF2 is loaded by the first opened file, not at the start of the gui
+        self.key = key
+        self.path = key[0]
+        self.file = open(self.path, "rb")
+        self.map = None
+        try:
+            # seeks of the reader are only pointer moves in the map, without system calls and the buffer of the file object
+            self.map = map_file(self.file)
+            self.reader = PdfFileReader(self.map if self.map is not None else self.file, strict=False)
+        except Exception:
+            self.close()
+            raise
+        self.lock = threading.RLock()  # PyPDF2 readers share one file position, so use them from one thread at a time
+        self.users = 0
+        self.is_evicted = False
+        self._pages_count = None
+        self._bookmarks = None
+
+    def _probe_pages_count(self):  # /Count of the pages root, None if it is missing or broken
+        try:
+            count = self.reader.trailer["/Root"].getObject()["/Pages"].getObject()["/Count"].getObject()
+        except Exception:
+            return None
+        return int(count) if isinstance(count, int) and count >= 0 else None
+
+    def get_pages_count(self):
+        if self._pages_count is None:
+            with self.lock:
+                # getNumPages() walks the whole page tree, the root /Count is read from two objects
+                count = None if self.reader.isEncrypted else self._probe_pages_count()
+                self._pages_count = count if count is not None else self.reader.getNumPages()
+        return self._pages_count
+
+    def get_bookmarks(self):  # sorted list of (page index, title) of the top level outline items
+        if self._bookmarks is None:
+            bookmarks = []
+            with self.lock:
+                try:
+                    outlines = self.reader.getOutlines()
+                except Exception:  # broken outlines are the same as no outlines
+                    outlines = []
+                for item in outlines:
+                    if isinstance(item, list):  # children of the previous item
+                        continue
+                    try:
+                        page_index = self.reader.getDestinationPageNumber(item)
+                    except Exception:
+                        continue
+                    if page_index is not None and page_index >= 0:
+                        bookmarks.append((page_index, str(item.title)))
+            self._bookmarks = sorted(bookmarks, key=lambda b: b[0])
+        return self._bookmarks
+
+    def close(self):
+        if self.map is not None and self.map.closed is False:
+            self.map.close()
+        if self.file.closed is False:
+            self.file.close()
+
+
+class PdfReaderCache(object):
+    def __init__(self, max_open_files=MAX_OPEN_FILES):
+        self.max_open_files = max(1, max_open_files)
+        self._entries = OrderedDict()  # key -> CachedReader, the last one is the most recently used
+        self._loading = {}  # key -> threading.Event of the readers which are parsed now, it is set when the parse is finished
+        self._lock = threading.Lock()  # files are parsed without the lock, so a large file does not stop the use of other files
+
+    def set_max_open_files(self, value):
+        with self._lock:
+            self.max_open_files = max(1, value)
+            self._evict()
+
+    def _evict(self):  # close least recently used readers, readers in use are closed when released
+        to_remove = len(self._entries) - self.max_open_files
+        if to_remove > 0:
+            for key in list(self._entries.keys())[:to_remove]:
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        entry.is_evicted = True
+        if entry.users == 0:
+            entry.close()
+
+    def acquire(self, pdf_path):
+        key = get_file_key(pdf_path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.users += 1
+                    return entry
+                loaded = self._loading.get(key)
+                if loaded is None:
+                    loaded = threading.Event()
+                    self._loading[key] = loaded
+                    break
+            loaded.wait()  # the same file is parsed by other thread, then its reader is in the cache or the parse failed
+        try:
+            entry = CachedReader(key)
+        except BaseException:
+            with self._lock:
+                self._loading.pop(key)
+            loaded.set()  # waiting threads try to parse the file themselves and get the error
+            raise
+        with self._lock:
+            # the file was changed, forget the old version
+            for old_key in [k for k in self._entries.keys() if k[0] == key[0]]:
+                self._remove(old_key)
+            self._entries[key] = entry
+            self._loading.pop(key)
+            entry.users += 1
+            self._evict()
+        loaded.set()
+        return entry
+
+    def release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            if entry.users == 0 and entry.is_evicted:
+                entry.close()
+
+    @contextmanager
+    def open_reader(self, pdf_path):
+        entry = self.acquire(pdf_path)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def get_pages_count(self, pdf_path):
+        with self.open_reader(pdf_path) as entry:
+            return entry.get_pages_count()
+
+    def get_bookmarks(self, pdf_path):
+        with self.open_reader(pdf_path) as entry:
+            return entry.get_bookmarks()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries.keys()):
+                self._remove(key)
+
+
+_reader_cache = None
+
+
+def get_reader_cache():
+    global _reader_cache
+    if _reader_cache is None:
+        _reader_cache = PdfReaderCache()
+    return _reader_cache
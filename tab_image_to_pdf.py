@@ -1,26 +1,34 @@
 import os
-from PySide2.QtWidgets import QWidget, QHBoxLayout, QListWidget, QAbstractItemView, QVBoxLayout, QGroupBox, QComboBox, QLabel, QPushButton, QSlider, QFileDialog
-from PySide2.QtCore import Qt, QSize
-from PySide2.QtGui import QImage, QPixmap
-from PIL import Image
-from processor_widgets import OptionsFromSourceWidget, OptionsAWidget, SelectWidget, ImageListItem
+from PySide2.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QGroupBox, QComboBox, QLabel, QPushButton, QFileDialog
+from PySide2.QtCore import Qt
+from qt_parameters import ParameterInteger, ParameterCombobox
+from image_encoder import JPEG_QUALITY
+from qt_threads import ThumbnailPrefetcher, FileProber
+from thumbnail_cache import get_thumbnail_cache
+from file_ingest import find_files, probe_image, IMAGE_EXTENSIONS
+from layout_plan import compute_layout, MM
+from processor_widgets import OptionsFromSourceWidget, OptionsAWidget, SelectWidget, EntryListModel, EntryListView, PreviewWidget
 
 
 class ImageToPdfWidget(QWidget):
     def __init__(self, status_link):
         super(ImageToPdfWidget, self).__init__()
         LABEL_WIDTH = 80
-        self.last_selected_items = []
+        self.last_selected_items = set()
         self.options_mode = 0
+        self.workers = 1
+        self.dpi = 0  # 0 keeps the source resolution
+        self.compression = 0  # 0 - flate, 1 - jpeg
+        self.quality = JPEG_QUALITY
         self.update_status_combobox = False
+        self.image_sizes = {}  # image path -> (width, height) from the probe, for the layout without decoding the images
         layout = QHBoxLayout()
         self.status_bar = status_link
-        self.list_view = QListWidget()
-        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
-        self.list_view.setAlternatingRowColors(True)
-        self.list_view.itemClicked.connect(self.click_item_signal)
-        self.list_view.itemEntered.connect(self.click_item_signal)
-        self.list_view.itemSelectionChanged.connect(self.change_selection_signal)
+        self.list_model = EntryListModel(self._get_image_text)
+        self.list_view = EntryListView(self.list_model)
+        self.list_view.clicked.connect(self.click_item_signal)
+        self.list_view.entered.connect(self.click_item_signal)
+        self.list_view.selectionModel().selectionChanged.connect(self.change_selection_signal)
 
         controls_layout = QVBoxLayout()
         controls_layout.setAlignment(Qt.AlignTop)
@@ -39,6 +47,14 @@ class ImageToPdfWidget(QWidget):
         options_mode_layout.addWidget(options_mode_label)
         options_mode_layout.addWidget(self.options_mode_combobox)
         self.options_zone_layout.addLayout(options_mode_layout)
+        workers_param = ParameterInteger(self, value=self.workers, max_visible=os.cpu_count() or 8, min_value=1, name="workers", label_text="Workers", label_width=LABEL_WIDTH, change_callback=self.change_workers_callback)
+        self.options_zone_layout.addWidget(workers_param)
+        dpi_param = ParameterInteger(self, value=self.dpi, max_visible=600, min_value=0, name="dpi", label_text="Image DPI", label_width=LABEL_WIDTH, change_callback=self.change_resample_callback)
+        compression_param = ParameterCombobox(self, value=self.compression, items=["Flate (lossless)", "JPEG"], name="compression", label_text="Compression", label_width=LABEL_WIDTH, change_callback=self.change_resample_callback)
+        quality_param = ParameterInteger(self, value=self.quality, max_visible=100, min_value=1, max_value=100, name="quality", label_text="JPEG Quality", label_width=LABEL_WIDTH, change_callback=self.change_resample_callback)
+        self.options_zone_layout.addWidget(dpi_param)
+        self.options_zone_layout.addWidget(compression_param)
+        self.options_zone_layout.addWidget(quality_param)
         self.option_source_widget = OptionsFromSourceWidget(label_width=LABEL_WIDTH, status_bar=self.status_bar)
         self.options_a_widget = OptionsAWidget(label_width=LABEL_WIDTH, status_bar=self.status_bar)
         self.options_mode_combobox.currentIndexChanged.connect(self.change_options_mode_signal)
@@ -49,75 +65,43 @@ class ImageToPdfWidget(QWidget):
         # Add files button and final structures ---------------------------
         add_file_button = QPushButton("Add Files")
         add_file_button.clicked.connect(self.click_add_files)
+        add_folder_button = QPushButton("Add Folder")
+        add_folder_button.clicked.connect(self.click_add_folder)
         controls_layout.addWidget(select_zone)
         controls_layout.addWidget(options_zone)
         controls_layout.addWidget(add_file_button)
+        controls_layout.addWidget(add_folder_button)
+
+        # added files are checked in the background, so broken and renamed files are not added
+        self.prober = FileProber(probe_image)
+        self.prober.probed_signal.connect(self.images_probed_signal)
+        self.setAcceptDrops(True)  # files and folders dropped to the tab
 
         # image preview ---------------------------------------------------
-        image_prev_layout = QVBoxLayout()
-        image_prev_layout.setContentsMargins(0, 0, 4, 0)
-        self.IMG_PREVIEW_WIDTH = 256
-        self.img_label = QLabel()
-        self.img_label.setAlignment(Qt.AlignCenter)
-        self.select_text = "Click item to preview"
-        self.last_created_pix_path = ""
-        self.img_label.setText(self.select_text)
-        image_prev_layout.addWidget(self.img_label)
-        # slider for the preview scale
-        self.img_scale_slider = QSlider()
-        self.img_scale_slider.setMinimum(6)
-        self.img_scale_slider.setMaximum(2048)
-        self.img_scale_slider.setValue(self.IMG_PREVIEW_WIDTH)
-        self.img_scale_slider.setOrientation(Qt.Horizontal)
-        self.img_scale_slider.valueChanged.connect(self.change_scale_slider_signal)
-        image_prev_layout.addWidget(self.img_scale_slider)
-        self._update_preview()
-
-        layout.addLayout(image_prev_layout)
+        self.PREFETCH_NEIGHBOURS = 3
+        self.prefetcher = ThumbnailPrefetcher(get_thumbnail_cache())
+        self.preview_widget = PreviewWidget(self.prefetcher, status_bar=self.status_bar)
+
+        layout.addWidget(self.preview_widget)
         layout.addWidget(self.list_view)
         layout.addLayout(controls_layout)
         self.setLayout(layout)
         self.update_status_combobox = True
 
-    def _pillow_to_pixmap(self, img):
-        if img.mode == "RGB":
-            r, g, b = img.split()
-            img = Image.merge("RGB", (b, g, r))
-        elif img.mode == "RGBA":
-            r, g, b, a = img.split()
-            img = Image.merge("RGBA", (b, g, r, a))
-        elif img.mode == "L":
-            img = img.convert("RGBA")
-        img2 = img.convert("RGBA")
-        data = img2.tobytes("raw", "RGBA")
-        qim = QImage(data, img.size[0], img.size[1], QImage.Format_ARGB32)
-        pixmap = QPixmap.fromImage(qim)
-        return pixmap
-
-    def _update_preview(self):
-        self.img_label.setMinimumWidth(self.IMG_PREVIEW_WIDTH)
-        self.img_label.setMaximumWidth(max(self.IMG_PREVIEW_WIDTH, self.img_scale_slider.width()))
-        if len(self.last_created_pix_path) > 0:
-            img = Image.open(self.last_created_pix_path)
-            img_pix = self._pillow_to_pixmap(img)
-            img_pix = img_pix.scaled(QSize(self.IMG_PREVIEW_WIDTH, self.IMG_PREVIEW_WIDTH), Qt.KeepAspectRatio)
-            self.img_label.setPixmap(img_pix)
-
-    def _set_preview(self, img_path):
-        if img_path is None:
-            self.last_created_pix_path = ""
-            self.img_label.setText(self.select_text)
-        else:
-            if img_path != self.last_created_pix_path:
-                self.last_created_pix_path = img_path
-                self._update_preview()
+    def _prefetch_neighbours(self, row):
+        paths = []
+        for delta in range(1, self.PREFETCH_NEIGHBOURS + 1):
+            for neighbour in (row + delta, row - delta):
+                if 0 <= neighbour < self.list_view.count():
+                    paths.append(self.list_model.get_data(neighbour))
+        self.preview_widget.prefetch(paths, "neighbours", 1)
 
     def _add_items_to_mode_combobox(self, combobox):
         combobox.addItem("From Source")
         combobox.addItem("A4")
-        # combobox.addItem("A5")
-        # combobox.addItem("A6")
-        # combobox.addItem("Letter")
+        combobox.addItem("A5")
+        combobox.addItem("A6")
+        combobox.addItem("Letter")
 
     def _get_filtered_string(self, string):
         to_return_array = []
@@ -127,41 +111,65 @@ class ImageToPdfWidget(QWidget):
         return "".join(to_return_array)
 
     def get_images_to_save(self):
-        path_array = []
-        for i in range(self.list_view.count()):
-            path_array.append(self.list_view.item(i).get_data())
-        return path_array
+        return [self.list_model.get_data(i) for i in range(self.list_view.count())]
 
     def get_image_parameters(self):  # return as dictionary
         if self.options_mode == 0:
-            return {"mode": 0,
-                    "pixels": self.option_source_widget.get_pixel_value(),
-                    "margin": self.option_source_widget.get_margin_value(),
-                    "background": self.option_source_widget.get_background_value()}
+            params = {"mode": 0,
+                      "pixels": self.option_source_widget.get_pixel_value(),
+                      "margin": self.option_source_widget.get_margin_value(),
+                      "background": self.option_source_widget.get_background_value()}
         else:
-            return {"mode": self.options_mode,
-                    "align": self.options_a_widget.get_align_value(),
-                    "margin": self.options_a_widget.get_margin_value(),
-                    "background": self.options_a_widget.get_background_value()}
-
-    def add_items(self, array):
-        added_names = []
-        for a in array:
-            new_name = os.path.basename(a)
-            new_item = ImageListItem(new_name, a)
-            added_names.append(new_name)
-            self.list_view.addItem(new_item)
-        self.status_bar.showMessage("Add items: " + ", ".join(added_names))
-
-    def change_scale_slider_signal(self, value):
-        self.IMG_PREVIEW_WIDTH = value
-        self._update_preview()
-        self.status_bar.showMessage("Set preview scale to " + str(value))
-
-    def click_item_signal(self, item):
+            params = {"mode": self.options_mode,
+                      "align": self.options_a_widget.get_align_value(),
+                      "margin": self.options_a_widget.get_margin_value(),
+                      "background": self.options_a_widget.get_background_value()}
+        params["workers"] = self.workers
+        params["dpi"] = self.dpi
+        params["compression"] = "jpeg" if self.compression == 1 else "flate"
+        params["quality"] = self.quality
+        return params
+
+    def get_layout_text(self, img_path):  # page size and image rectangle in millimeters with the current options, None if the size is unknown
+        size = self.image_sizes.get(img_path)
+        if size is None:
+            return None
+        (page_width, page_height), (x, y, img_width, img_height) = compute_layout([size], self.get_image_parameters()).get_page(0)
+        return "page " + str(round(page_width / MM)) + " x " + str(round(page_height / MM)) + " mm, image " + str(round(img_width / MM)) + " x " + str(round(img_height / MM)) + " mm at " + str(round(x / MM)) + ", " + str(round(y / MM)) + " mm"
+
+    def _get_image_text(self, img_path, page_index):
+        return os.path.basename(img_path)
+
+    def add_items(self, array, max_names=10):
+        added_names = [os.path.basename(a) for a in array[:max_names]]
+        self.list_model.add_files(array)
+        self.preview_widget.prefetch(array, "added", 0)
+        left = self.prober.pending_count()
+        self.status_bar.showMessage("Add items: " + ", ".join(added_names) + (" and " + str(len(array) - len(added_names)) + " more" if len(array) > len(added_names) else "") + ((", " + str(left) + " files left") if left > 0 else ""))
+
+    def ingest(self, sources):  # files, folders (with subfolders) and glob patterns
+        paths = find_files(sources, IMAGE_EXTENSIONS)
+        if len(paths) == 0:
+            self.status_bar.showMessage("No images found")
+            return
+        self.prober.probe(paths)
+        self.status_bar.showMessage("Check " + str(len(paths)) + " files")
+
+    def images_probed_signal(self, batch):  # images are added in the natural order as soon as they and all previous files are checked
+        for path, size, error in batch:
+            if error is None:
+                self.image_sizes[path] = size
+        paths = [path for path, size, error in batch if error is None]
+        skipped = [os.path.basename(path) for path, size, error in batch if error is not None]
+        if len(paths) > 0:
+            self.add_items(paths)
+        if len(skipped) > 0:
+            self.status_bar.showMessage("Skip files which are not images: " + ", ".join(skipped[:10]) + (" and " + str(len(skipped) - 10) + " more" if len(skipped) > 10 else ""))
+
+    def click_item_signal(self, index):
         pass
-        # self._set_preview(item.get_data())
-        # self.status_bar.showMessage("Select " + str(item.text()))
+        # self.preview_widget.set_source(self.list_model.get_data(index.row()))
+        # self.status_bar.showMessage("Select " + self.list_model.get_text(index.row()))
 
     def _get_first_new_index(self, current, last):
         for v in current:
@@ -169,15 +177,35 @@ class ImageToPdfWidget(QWidget):
                 return v
         return current[0]
 
-    def change_selection_signal(self):
-        if len(self.list_view.selectedItems()) == 0:
-            self._set_preview(None)  # nothing selected
+    def change_selection_signal(self, selected=None, deselected=None):
+        if self.list_view.has_selection() is False:
+            self.preview_widget.set_source(None)  # nothing selected
+            self.last_selected_items = set()
         else:
-            selected_indexes = [self.list_view.indexFromItem(sel).row() for sel in self.list_view.selectedItems()]
-            item = self.list_view.item(self._get_first_new_index(selected_indexes, self.last_selected_items))
-            self._set_preview(item.get_data())
-            self.status_bar.showMessage("Select " + str(item.text()))
-            self.last_selected_items = selected_indexes
+            selected_indexes = self.list_view.get_selected_rows()
+            row = self._get_first_new_index(selected_indexes, self.last_selected_items)
+            # cancel before the preview request, otherwise the current image may be skipped as a cancelled neighbour
+            self.prefetcher.cancel("neighbours")
+            self.preview_widget.set_source(self.list_model.get_data(row))
+            self._prefetch_neighbours(row)
+            layout_text = self.get_layout_text(self.list_model.get_data(row))
+            self.status_bar.showMessage("Select " + self.list_model.get_text(row) + ("" if layout_text is None else ": " + layout_text))
+            self.last_selected_items = set(selected_indexes)
+
+    def change_workers_callback(self, param_name="", param_value=None):
+        self.workers = param_value
+        self.status_bar.showMessage("Set number of workers to " + str(self.workers))
+
+    def change_resample_callback(self, param_name="", param_value=None):
+        if param_name == "dpi":
+            self.dpi = param_value
+            self.status_bar.showMessage("Set image resolution to " + (str(self.dpi) + " dpi" if self.dpi > 0 else "the source resolution"))
+        elif param_name == "compression":
+            self.compression = param_value[0]
+            self.status_bar.showMessage("Set image compression to " + str(param_value[1][self.compression]))
+        elif param_name == "quality":
+            self.quality = param_value
+            self.status_bar.showMessage("Set jpeg quality to " + str(self.quality))
 
     def change_options_mode_signal(self, index):
         self.options_mode = index
@@ -197,56 +225,29 @@ class ImageToPdfWidget(QWidget):
         pass
 
     def click_move_up(self):
-        selected = self.list_view.selectedItems()
-        selected_indexes = [self.list_view.indexFromItem(sel).row() for sel in selected]
-        selected_indexes.sort()
-        if len(selected_indexes) > 0 and selected_indexes[0] > 0:
-            for index in selected_indexes:
-                prev_item = self.list_view.takeItem(index - 1)
-                self.list_view.insertItem(index, prev_item)
-            self.status_bar.showMessage("Move " + str(len(selected_indexes)) + " items")
+        moved = self.list_view.move_selected(-1)
+        if moved > 0:
+            self.status_bar.showMessage("Move " + str(moved) + " items")
         else:
             self.status_bar.showMessage("Nothing to move")
 
     def click_move_down(self):
-        selected = self.list_view.selectedItems()
-        selected_indexes = [self.list_view.indexFromItem(sel).row() for sel in selected]
-        selected_indexes.sort()
-        sel_count = len(selected_indexes)
-        if len(selected_indexes) > 0 and selected_indexes[sel_count - 1] < self.list_view.count() - 1:
-            for i_index in range(sel_count):
-                next_item = self.list_view.takeItem(selected_indexes[sel_count - i_index - 1] + 1)
-                self.list_view.insertItem(selected_indexes[sel_count - i_index - 1], next_item)
-            self.status_bar.showMessage("Move " + str(len(selected_indexes)) + " items")
+        moved = self.list_view.move_selected(1)
+        if moved > 0:
+            self.status_bar.showMessage("Move " + str(moved) + " items")
         else:
             self.status_bar.showMessage("Nothing to move")
 
     def click_invert(self):
-        selected = self.list_view.selectedItems()
-        selected_indexes = []
-        for sel in selected:
-            selected_indexes.append(self.list_view.indexFromItem(sel).row())
-        total_indexes = [i for i in range(self.list_view.count())]
-        new_indexes = []
-        for i in total_indexes:
-            if i not in selected_indexes:
-                new_indexes.append(i)
-        self.list_view.clearSelection()
-        for i in new_indexes:
-            self.list_view.item(i).setSelected(True)
-        self.status_bar.showMessage("Invert selection: " + str(new_indexes))
+        selected = self.list_view.invert_selection()
+        self.status_bar.showMessage("Invert selection: " + str(selected) + " items selected")
 
     def click_delete(self):
-        selected = self.list_view.selectedItems()
-        delete_names = []
-        for s in selected:
-            s_index = self.list_view.indexFromItem(s).row()
-            del_item = self.list_view.takeItem(s_index)
-            delete_names.append(del_item.text())
-        if len(delete_names) == 0:
+        deleted, delete_names = self.list_view.delete_selected()
+        if deleted == 0:
             self.status_bar.showMessage("Nothing to delete")
         else:
-            self.status_bar.showMessage("Delete items: " + ", ".join(delete_names))
+            self.status_bar.showMessage("Delete items: " + ", ".join(delete_names) + (" and " + str(deleted - len(delete_names)) + " more" if deleted > len(delete_names) else ""))
 
     def click_add_files(self):
         files_dialog = QFileDialog()
@@ -254,4 +255,19 @@ class ImageToPdfWidget(QWidget):
         files_dialog.setFileMode(QFileDialog.ExistingFiles)
         if files_dialog.exec_():
             files = files_dialog.selectedFiles()
-            self.add_items(files)
+            self.ingest(files)
+
+    def click_add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Folder")
+        if len(folder) > 0:
+            self.ingest([folder])
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        sources = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if len(sources) > 0:
+            event.acceptProposedAction()
+            self.ingest(sources)
@@ -1,8 +1,16 @@
 import os
-from PySide2.QtWidgets import QWidget, QHBoxLayout, QListWidget, QAbstractItemView, QVBoxLayout, QPushButton, QFileDialog
-from PySide2.QtCore import Qt
-from PyPDF2 import PdfFileReader
-from processor_widgets import SelectWidget, ImageListItem
+from operator import add
+from PySide2.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QPushButton, QFileDialog, QLineEdit
+from PySide2.QtCore import Qt, QSize
+from PySide2.QtGui import QPixmap
+from reader_cache import get_reader_cache
+from file_ingest import find_files, probe_pdf, PDF_EXTENSIONS
+from page_plan import PagePlan
+from page_ranges import PageRangeExpression, mask_to_ranges
+from qt_threads import ThumbnailPrefetcher, FileProber
+from thumbnail_cache import LruCache, get_thumbnail_cache, get_size_bucket, get_source_key
+from pdf_render import is_render_available
+from processor_widgets import SelectWidget, EntryListModel, EntryListView, PreviewWidget
 
 
 class SynthPdfWidget(QWidget):
@@ -10,12 +18,22 @@ class SynthPdfWidget(QWidget):
         super(SynthPdfWidget, self).__init__()
         self.status_bar = status_bar
         layout = QHBoxLayout()
-        self.list_view = QListWidget()
-        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
-        self.list_view.setAlternatingRowColors(True)
-        self.list_view.itemClicked.connect(self.click_item_signal)
-        self.list_view.itemEntered.connect(self.click_item_signal)
-        self.list_view.itemSelectionChanged.connect(self.change_selection_signal)
+        self.ICON_SIZE = 48
+        self.icon_cache = LruCache(max_items=1024)  # ("icon", source key, size bucket) -> QPixmap
+        self.failed_icons = set()  # keys of pages which can not be rendered, they are not requested again
+        self.prefetcher = ThumbnailPrefetcher(get_thumbnail_cache())
+        self.prefetcher.thumbnail_signal.connect(self.thumbnail_ready_signal)
+        self.prober = FileProber(probe_pdf)
+        self.prober.probed_signal.connect(self.pdf_probed_signal)
+        self.setAcceptDrops(True)  # files and folders dropped to the tab
+        self.list_model = EntryListModel(self._get_page_text, self._get_page_icon if is_render_available() else None)
+        self.list_view = EntryListView(self.list_model)
+        self.list_view.setIconSize(QSize(self.ICON_SIZE, self.ICON_SIZE))
+        # icons of the rows scrolled away are not needed anymore
+        self.list_view.verticalScrollBar().valueChanged.connect(self.scroll_list_signal)
+        self.list_view.clicked.connect(self.click_item_signal)
+        self.list_view.entered.connect(self.click_item_signal)
+        self.list_view.selectionModel().selectionChanged.connect(self.change_selection_signal)
 
         controls_layout = QVBoxLayout()
         controls_layout.setAlignment(Qt.AlignTop)
@@ -23,50 +41,105 @@ class SynthPdfWidget(QWidget):
         select_zone = SelectWidget(self.click_move_up, self.click_move_down, self.click_invert, self.click_delete)
         select_zone.setMinimumWidth(250)
 
+        # pages of every file are selected by one expression, without clicking the rows
+        select_pages_layout = QHBoxLayout()
+        self.select_pages_line_edit = QLineEdit()
+        self.select_pages_line_edit.setPlaceholderText("1-50, 80-, odd, !3-7")
+        self.select_pages_line_edit.setToolTip("Pages of every file: numbers and ranges are added, ! removes pages, odd, even and all are keywords")
+        self.select_pages_line_edit.returnPressed.connect(self.click_select_pages)
+        select_pages_button = QPushButton("Select Pages")
+        select_pages_button.clicked.connect(self.click_select_pages)
+        select_pages_layout.addWidget(self.select_pages_line_edit)
+        select_pages_layout.addWidget(select_pages_button)
+
         add_pages_button = QPushButton("Add Pages From PDF")
         add_pages_button.clicked.connect(self.add_pdf)
+        add_folder_button = QPushButton("Add Folder")
+        add_folder_button.clicked.connect(self.add_folder)
 
         controls_layout.addWidget(select_zone)
+        controls_layout.addLayout(select_pages_layout)
         controls_layout.addWidget(add_pages_button)
+        controls_layout.addWidget(add_folder_button)
+
+        # page preview, pages are rendered only if PyMuPDF is installed
+        self.preview_widget = PreviewWidget(self.prefetcher, status_bar=self.status_bar, select_text="Click page to preview" if is_render_available() else "Install PyMuPDF to preview pdf pages")
 
+        layout.addWidget(self.preview_widget)
         layout.addWidget(self.list_view)
         layout.addLayout(controls_layout)
         self.setLayout(layout)
 
+    def _get_page_text(self, pdf_path, page_index):
+        return "page " + str(page_index + 1) + " (" + os.path.basename(pdf_path) + ")"
+
+    def _get_icon_key(self, pdf_path, page_index):
+        try:
+            return ("icon", get_source_key((pdf_path, page_index)), get_size_bucket(self.ICON_SIZE))
+        except OSError:  # the file was deleted
+            return None
+
+    def _get_page_icon(self, pdf_path, page_index):  # called only for visible rows, return None while the icon is rendered
+        key = self._get_icon_key(pdf_path, page_index)
+        if key is None or key in self.failed_icons:
+            return None
+        pixmap = self.icon_cache.get(key)
+        if pixmap is None:
+            self.prefetcher.request(key, (pdf_path, page_index), self.ICON_SIZE, group="icons", priority=0)
+        return pixmap
+
     def _add_pages_from_pdf(self, pdf_path):
-        with open(pdf_path, "rb") as file:
-            reader = PdfFileReader(file)
-            file_name = os.path.basename(pdf_path)
-            pages_count = reader.getNumPages()
-            for i in range(pages_count):
-                new_item = ImageListItem("page " + str(i + 1) + " (" + file_name + ")", (pdf_path, i))
-                self.list_view.addItem(new_item)
-            self.status_bar.showMessage("Add " + str(pages_count) + " pages")
+        try:
+            pages_count = get_reader_cache().get_pages_count(pdf_path)
+        except Exception as e:
+            self.status_bar.showMessage("Can not open " + os.path.basename(pdf_path) + ": " + str(e))
+            return
+        self.list_model.add_entries(pdf_path, range(pages_count))
+        self.status_bar.showMessage("Add " + str(pages_count) + " pages")
 
     # ----------external methods from create command
-    def extern_get_files_and_pages(self):  # return selected pages in the form {file1: [p1, p2, ...], file2: [p1, p2, ...], ...}
-        to_return = {}
-        if len(self.list_view.selectedItems()) == 0:  # nothing selected, add all pages
-            items_count = self.list_view.count()
-            for item_index in range(items_count):
-                item = self.list_view.item(item_index)
-                item_data = item.get_data()
-                file_name = item_data[0]
-                page_index = item_data[1]
-                if file_name in to_return:
-                    to_return[file_name].append(page_index)
-                else:
-                    to_return[file_name] = [page_index]
+    def extern_get_files_and_pages(self):  # return selected pages as PagePlan in the list order
+        page_plan = PagePlan()
+        if self.list_view.has_selection() is False:  # nothing selected, add all pages
+            ranges = [(0, self.list_view.count() - 1)] if self.list_view.count() > 0 else []
         else:
-            for s in self.list_view.selectedItems():
-                s_data = s.get_data()
-                file_name = s_data[0]
-                page_index = s_data[1]
-                if file_name in to_return:
-                    to_return[file_name].append(page_index)
-                else:
-                    to_return[file_name] = [page_index]
-        return to_return
+            ranges = self.list_view.get_selected_ranges()
+        sources = self.list_model.sources
+        entry_sources = self.list_model.entry_sources
+        entry_pages = self.list_model.entry_pages
+        last = -1
+        for top, bottom in ranges:
+            row = max(top, last + 1)  # ranges of the selection can overlap
+            while row <= bottom:  # rows with the next pages of the same file are added as one run
+                source_id = entry_sources[row]
+                first_page = entry_pages[row]
+                end = row + 1
+                while end <= bottom and entry_sources[end] == source_id and entry_pages[end] == first_page + end - row:
+                    end += 1
+                page_plan.add_range(sources[source_id], first_page, first_page + end - row)
+                row = end
+            last = max(last, bottom)
+        return page_plan
+
+    def select_pages(self, text):  # select pages of every file by the page range expression, return the number of selected rows
+        expression = PageRangeExpression(text)
+        sources = self.list_model.sources
+        entry_sources = self.list_model.entry_sources
+        entry_pages = self.list_model.entry_pages
+        pages_counts = [0] * len(sources)  # pages of the files which are in the list
+        for source_id, page in zip(entry_sources, entry_pages):
+            if page >= pages_counts[source_id]:
+                pages_counts[source_id] = page + 1
+        # masks of all files are joined, then every row takes its byte at the offset of its file plus its page
+        offsets = []
+        pages_mask = bytearray()
+        for pages_count in pages_counts:
+            offsets.append(len(pages_mask))
+            pages_mask += expression.get_mask(pages_count)
+        rows_mask = bytearray(map(pages_mask.__getitem__, map(add, map(offsets.__getitem__, entry_sources), entry_pages)))
+        ranges = mask_to_ranges(rows_mask)
+        self.list_view.select_ranges([(start, stop - 1) for start, stop in ranges])
+        return sum(stop - start for start, stop in ranges)
 
     # ----------add button-----------------------
     def add_pdf(self):
@@ -75,67 +148,104 @@ class SynthPdfWidget(QWidget):
         files_dialog.setFileMode(QFileDialog.ExistingFiles)
         if files_dialog.exec_():
             files = files_dialog.selectedFiles()
-            for f_path in files:
-                self._add_pages_from_pdf(f_path)
+            if len(files) == 1:
+                self._add_pages_from_pdf(files[0])
+            elif len(files) > 1:
+                self.ingest(files)
+
+    def add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Folder")
+        if len(folder) > 0:
+            self.ingest([folder])
+
+    def ingest(self, sources):  # files, folders (with subfolders) and glob patterns, files are opened in the background
+        paths = find_files(sources, PDF_EXTENSIONS)
+        if len(paths) == 0:
+            self.status_bar.showMessage("No pdf files found")
+            return
+        self.prober.probe(paths)
+        self.status_bar.showMessage("Open " + str(len(paths)) + " files")
+
+    def pdf_probed_signal(self, batch):  # pages of every file are added as soon as the file and all previous files are probed
+        pages = 0
+        errors = []
+        for pdf_path, pages_count, error in batch:
+            if error is not None:
+                errors.append(os.path.basename(pdf_path) + ": " + error)
+            else:
+                self.list_model.add_entries(pdf_path, range(pages_count))
+                pages += pages_count
+        left = self.prober.pending_count()
+        message = "Add " + str(pages) + " pages" + ((", " + str(left) + " files left") if left > 0 else "")
+        if len(errors) > 0:
+            message += ". Can not open " + "; ".join(errors[:3]) + (" and " + str(len(errors) - 3) + " more" if len(errors) > 3 else "")
+        self.status_bar.showMessage(message)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        sources = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if len(sources) > 0:
+            event.acceptProposedAction()
+            self.ingest(sources)
+
+    def click_select_pages(self):
+        try:
+            selected = self.select_pages(self.select_pages_line_edit.text())
+        except ValueError as e:
+            self.status_bar.showMessage(str(e))
+            return
+        self.status_bar.showMessage("Select " + str(selected) + " pages")
 
     # ----------List_view signals----------------
-    def click_item_signal(self, item):
-        self.status_bar.showMessage("Select " + str(item.text()))
+    def click_item_signal(self, index):
+        self.status_bar.showMessage("Select " + self.list_model.get_text(index.row()))
 
-    def change_selection_signal(self):
-        if len(self.list_view.selectedItems()) == 0:
-            # self._set_preview(None)  # nothing selected
-            pass
+    def change_selection_signal(self, selected=None, deselected=None):
+        if self.list_view.has_selection() is False:
+            self.preview_widget.set_source(None)  # nothing selected
+        else:
+            index = self.list_view.currentIndex()
+            row = index.row() if index.isValid() and self.list_view.selectionModel().isSelected(index) else min(top for top, bottom in self.list_view.get_selected_ranges())
+            self.preview_widget.set_source(self.list_model.get_data(row))
+
+    def scroll_list_signal(self, value):
+        self.prefetcher.cancel("icons")
+        self.list_view.viewport().update()  # request icons of the new visible rows
+
+    def thumbnail_ready_signal(self, key, qimage):
+        if key[0] != "icon":
+            return
+        if qimage is None:
+            self.failed_icons.add(key)
+            return
+        self.icon_cache.put(key, QPixmap.fromImage(qimage).scaled(QSize(self.ICON_SIZE, self.ICON_SIZE), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        self.list_view.viewport().update()
 
     # ----------list_view commands---------------
     def click_move_up(self):
-        selected = self.list_view.selectedItems()
-        selected_indexes = [self.list_view.indexFromItem(sel).row() for sel in selected]
-        selected_indexes.sort()
-        if len(selected_indexes) > 0 and selected_indexes[0] > 0:
-            for index in selected_indexes:
-                prev_item = self.list_view.takeItem(index - 1)
-                self.list_view.insertItem(index, prev_item)
-            self.status_bar.showMessage("Move " + str(len(selected_indexes)) + " items")
+        moved = self.list_view.move_selected(-1)
+        if moved > 0:
+            self.status_bar.showMessage("Move " + str(moved) + " items")
         else:
             self.status_bar.showMessage("Nothing to move")
 
     def click_move_down(self):
-        selected = self.list_view.selectedItems()
-        selected_indexes = [self.list_view.indexFromItem(sel).row() for sel in selected]
-        selected_indexes.sort()
-        sel_count = len(selected_indexes)
-        if len(selected_indexes) > 0 and selected_indexes[sel_count - 1] < self.list_view.count() - 1:
-            for i_index in range(sel_count):
-                next_item = self.list_view.takeItem(selected_indexes[sel_count - i_index - 1] + 1)
-                self.list_view.insertItem(selected_indexes[sel_count - i_index - 1], next_item)
-            self.status_bar.showMessage("Move " + str(len(selected_indexes)) + " items")
+        moved = self.list_view.move_selected(1)
+        if moved > 0:
+            self.status_bar.showMessage("Move " + str(moved) + " items")
         else:
             self.status_bar.showMessage("Nothing to move")
 
     def click_invert(self):
-        selected = self.list_view.selectedItems()
-        selected_indexes = []
-        for sel in selected:
-            selected_indexes.append(self.list_view.indexFromItem(sel).row())
-        total_indexes = [i for i in range(self.list_view.count())]
-        new_indexes = []
-        for i in total_indexes:
-            if i not in selected_indexes:
-                new_indexes.append(i)
-        self.list_view.clearSelection()
-        for i in new_indexes:
-            self.list_view.item(i).setSelected(True)
-        self.status_bar.showMessage("Invert selection: " + str(new_indexes))
+        selected = self.list_view.invert_selection()
+        self.status_bar.showMessage("Invert selection: " + str(selected) + " items selected")
 
     def click_delete(self):
-        selected = self.list_view.selectedItems()
-        delete_names = []
-        for s in selected:
-            s_index = self.list_view.indexFromItem(s).row()
-            del_item = self.list_view.takeItem(s_index)
-            delete_names.append(del_item.text())
-        if len(delete_names) == 0:
+        deleted, delete_names = self.list_view.delete_selected()
+        if deleted == 0:
             self.status_bar.showMessage("Nothing to delete")
         else:
-            self.status_bar.showMessage("Delete items: " + ", ".join(delete_names))
+            self.status_bar.showMessage("Delete items: " + ", ".join(delete_names) + (" and " + str(deleted - len(delete_names)) + " more" if deleted > len(delete_names) else ""))
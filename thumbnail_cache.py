@@ -0,0 +1,184 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from reader_cache import get_file_key
+from pdf_render import render_page
+
+# previews are made for fixed sizes (powers of two), the gui scales the nearest bigger one to the exact size
+# thumbnails of the previews are also stored on disk, so they are not decoded again in the next sessions
+# a source is an image path or a tuple (pdf path, page index)
+
+THUMBNAIL_MIN_SIZE = 64
+DISK_CACHE_MAX_SIZE = 1024  # bigger previews are made every time from the source
+DISK_CACHE_MAX_BYTES = 512 * 1024 * 1024
+FINGERPRINT_BLOCK = 1024 * 1024  # bytes read at once by the hash of the whole file
+
+
+def get_cache_dir():
+    path = os.environ.get("PDF_PROCESSOR_CACHE")
+    if path is None:
+        base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        path = os.path.join(base, "pdf_processor")
+    return path
+
+
+_fingerprints = {}
+_fingerprint_locks = {}  # file key -> lock of the file which is hashed now
+_fingerprints_lock = threading.Lock()
+
+
+def get_file_fingerprint(file_path):  # hash of the whole file, it does not depend on the file name
+    # the file is read once for every (path, modification time, size), the first page previews of a session wait for it
+    file_key = get_file_key(file_path)
+    with _fingerprints_lock:
+        fingerprint = _fingerprints.get(file_key)
+        if fingerprint is not None:
+            return fingerprint
+        file_lock = _fingerprint_locks.setdefault(file_key, threading.Lock())
+    with file_lock:  # threads asking for the same file wait for one hash
+        with _fingerprints_lock:
+            fingerprint = _fingerprints.get(file_key)
+        if fingerprint is None:
+            digest = hashlib.sha1(str(file_key[2]).encode())
+            with open(file_path, "rb") as file:
+                block = file.read(FINGERPRINT_BLOCK)
+                while len(block) > 0:
+                    digest.update(block)
+                    block = file.read(FINGERPRINT_BLOCK)
+            fingerprint = digest.hexdigest()
+            with _fingerprints_lock:
+                _fingerprints[file_key] = fingerprint
+                _fingerprint_locks.pop(file_key, None)
+    return fingerprint
+
+
+def get_source_key(source):  # memory cache key of the source, it changes when the file is changed
+    if isinstance(source, tuple):
+        return (get_file_key(source[0]), source[1])
+    return get_file_key(source)
+
+
+def get_size_bucket(size):
+    bucket = THUMBNAIL_MIN_SIZE
+    while bucket < size:
+        bucket *= 2
+    return bucket
+
+
+class LruCache(object):
+    def __init__(self, max_items=64):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def make_thumbnail(img_path, bucket):  # decode the image directly at the reduced size (jpeg draft mode or reduce() for other formats)
+    from PIL import Image
+    with Image.open(img_path) as img:
+        img.thumbnail((bucket, bucket), reducing_gap=2.0)
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        else:
+            img.load()
+            img = img.copy()
+    return img
+
+
+def make_source_thumbnail(source, bucket):  # return None if the source can not be previewed
+    if isinstance(source, tuple):
+        return render_page(source[0], source[1], bucket)
+    return make_thumbnail(source, bucket)
+
+
+class ThumbnailCache(object):
+    def __init__(self, directory=None, max_bytes=DISK_CACHE_MAX_BYTES):
+        self.directory = os.path.join(get_cache_dir(), "thumbnails") if directory is None else directory
+        self.max_bytes = max_bytes
+
+    def _get_thumbnail_path(self, source, bucket):
+        if isinstance(source, tuple):  # pages are stored by the file content, so renamed or copied files use the same tiles
+            name = "page|" + get_file_fingerprint(source[0]) + "|" + str(source[1]) + "|" + str(bucket)
+        else:
+            name = str(get_file_key(source)) + "|" + str(bucket)
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".png")
+
+    def prune(self):  # remove the least recently used files while the cache is bigger than max_bytes
+        files = []
+        total = 0
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total > self.max_bytes:
+            files.sort()
+            for mtime, size, path in files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes * 0.9:
+                    break
+
+    def get_thumbnail(self, source, size):  # return Pillow image which fits to the square (bucket, bucket) for the requested size
+        bucket = get_size_bucket(size)
+        if bucket > DISK_CACHE_MAX_SIZE:
+            return make_source_thumbnail(source, bucket)
+        thumbnail_path = self._get_thumbnail_path(source, bucket)
+        if os.path.exists(thumbnail_path):
+            from PIL import Image
+            try:
+                with Image.open(thumbnail_path) as img:
+                    img.load()
+                    img = img.copy()
+                os.utime(thumbnail_path)  # mark as recently used for prune()
+                return img
+            except (OSError, ValueError):
+                pass  # broken cache file, make it again
+        img = make_source_thumbnail(source, bucket)
+        if img is None:
+            return None
+        try:
+            os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+            temp_path = thumbnail_path + "." + str(os.getpid()) + "_" + str(threading.get_ident()) + ".tmp"
+            img.save(temp_path, "PNG", compress_level=1)
+            os.replace(temp_path, thumbnail_path)
+        except OSError:
+            pass  # the cache is optional
+        return img
+
+
+_thumbnail_cache = None
+
+
+def get_thumbnail_cache():
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        _thumbnail_cache = ThumbnailCache()
+        threading.Thread(target=_thumbnail_cache.prune, daemon=True).start()
+    return _thumbnail_cache